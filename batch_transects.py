@@ -0,0 +1,305 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from dataset_pool import DATASET_POOL
+from element_cache import file_content_hash
+from instrumentation import INSTRUMENTATION, stage
+from get_graphs import load_transect, process_transect, render_transect_plots, save_transect_result
+from mesh_index import get_mesh_index
+from result_store import ResultStore
+from transect_files import count_transects, is_transect_file
+
+
+def transect_jobs_from_directory(directory, pattern="*.csv"):
+    """
+    Build transect jobs for every transect file in a directory.
+    Titles and output names are taken from the file names, so
+    "Cross_Section_1.csv" gives "cross section 1" and "cross_section_1".
+    Shapefiles and GeoPackages (e.g. pattern "*.shp") are read directly. A line
+    layer with several features gives one job per feature, numbered from 1.
+
+    Args:
+        directory: Folder containing the transect files
+        pattern: Glob pattern selecting the transect files
+
+    Returns:
+        list: (csv_path, title_text, output_name) tuples, sorted by path, with a
+        fourth element giving the feature index for multi-feature layers
+    """
+    jobs = []
+    for csv_path in sorted(glob.glob(os.path.join(directory, pattern))):
+        stem = os.path.splitext(os.path.basename(csv_path))[0]
+        output_name = "_".join(stem.lower().replace("-", " ").replace("_", " ").split())
+        n_features = count_transects(csv_path) if is_transect_file(csv_path) else 1
+        if n_features == 1:
+            jobs.append((csv_path, output_name.replace("_", " "), output_name))
+            continue
+        for feature in range(n_features):
+            name = f"{output_name}_{feature + 1}"
+            jobs.append((csv_path, name.replace("_", " "), name, feature))
+    return jobs
+
+
+def _profile_path(profile_dir, output_name):
+    """cProfile output file for a job, or None if profiling is off"""
+    if profile_dir is None:
+        return None
+    os.makedirs(profile_dir, exist_ok=True)
+    return os.path.join(profile_dir, f"{output_name}.prof")
+
+
+def _run_job(job, geom_file_path, stat_file_path, output_dir, result_store=None, scenario=None,
+             profile_dir=None):
+    """
+    Process one transect, capturing its timing, stage instrumentation and any failure.
+
+    Returns:
+        dict: csv_path, title, success, seconds, error (None if it succeeded)
+        and instrumentation (see Instrumentation.summary)
+    """
+    csv_path, title_text, output_name = job[:3]
+    feature = job[3] if len(job) > 3 else None
+    INSTRUMENTATION.reset()
+    start = time.perf_counter()
+    error = None
+    try:
+        success = process_transect(csv_path, title_text, geom_file_path, stat_file_path,
+                                   output_name=output_name, output_dir=output_dir,
+                                   result_store=result_store, scenario=scenario,
+                                   profile_path=_profile_path(profile_dir, output_name),
+                                   feature=feature)
+    except Exception:
+        success = False
+        error = traceback.format_exc()
+
+    return {
+        'csv_path': csv_path,
+        'title': title_text,
+        'success': bool(success),
+        'seconds': time.perf_counter() - start,
+        'error': error,
+        'instrumentation': INSTRUMENTATION.summary()
+    }
+
+
+def run_transects(jobs, geom_file_path, stat_file_path, workers=None, output_dir=".",
+                  result_store=None, scenario=None, profile_dir=None):
+    """
+    Process many transects across a pool of worker processes.
+    The mesh index, with its STR tree and face neighbours, and the geometry
+    file's content hash (the element ID cache key) are computed once in the
+    parent before the pool starts, so on platforms that fork the workers
+    inherit them instead of each re-reading the geometry file. Pooled netCDF
+    handles are closed first, as HDF5 handles must not be shared across a fork.
+
+    Args:
+        jobs: (csv_path, title_text, output_name[, feature]) tuples, see transect_jobs_from_directory
+        geom_file_path: Path to the geometry netCDF file
+        stat_file_path: Path to the statistics netCDF file
+        workers: Number of worker processes, os.cpu_count() if None. 1 runs in this process.
+        output_dir: Folder to save the plots in
+        result_store: ResultStore to save each transect's data in, or None
+        scenario: Scenario name to save under, the statistics file name if None
+        profile_dir: Folder to dump a cProfile file per transect in, or None to skip profiling
+
+    Returns:
+        list: One result dict per job (see _run_job), in job order
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_run_job(job, geom_file_path, stat_file_path, output_dir, result_store, scenario,
+                            profile_dir)
+                   for job in jobs]
+    else:
+        # Build the lazily created search structures too, or every worker builds its own
+        mesh_index = get_mesh_index(geom_file_path)
+        mesh_index.tree
+        mesh_index.edge_neighbours
+        # Hash the geometry file for the element ID cache key, or every worker reads all of it
+        file_content_hash(geom_file_path)
+        DATASET_POOL.close_all()
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = [executor.submit(_run_job, job, geom_file_path, stat_file_path, output_dir,
+                                       result_store, scenario, profile_dir)
+                       for job in jobs]
+            results = [future.result() for future in futures]
+    total = time.perf_counter() - start
+
+    _report(results, total, f"{workers} worker(s)")
+    return results
+
+
+def _render_job(transect_df, df, title_text, output_name, output_dir):
+    """Render one transect's plots, returning the seconds taken and the render instrumentation"""
+    INSTRUMENTATION.reset()
+    start = time.perf_counter()
+    render_transect_plots(transect_df, df, title_text, output_name, output_dir)
+    return time.perf_counter() - start, INSTRUMENTATION.summary()['stages']
+
+
+def run_transects_pipelined(jobs, geom_file_path, stat_file_path, render_workers=None, output_dir=".",
+                            result_store=None, scenario=None):
+    """
+    Process many transects, overlapping data extraction with plot rendering.
+    Transects are extracted one after another in this process, which keeps a
+    single mesh index and dataset pool, while finished DataFrames are rendered
+    to PNG in a pool of worker processes.
+
+    Args:
+        jobs: (csv_path, title_text, output_name[, feature]) tuples, see transect_jobs_from_directory
+        geom_file_path: Path to the geometry netCDF file
+        stat_file_path: Path to the statistics netCDF file
+        render_workers: Number of rendering processes, os.cpu_count() if None
+        output_dir: Folder to save the plots in
+        result_store: ResultStore to save each transect's data in, or None
+        scenario: Scenario name to save under, the statistics file name if None
+
+    Returns:
+        list: One result dict per job (see _run_job), in job order
+    """
+    if render_workers is None:
+        render_workers = os.cpu_count() or 1
+    render_workers = max(1, min(render_workers, len(jobs)))
+    os.makedirs(output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    results = []
+    pending = []
+
+    # Spawned workers do not inherit this process's open netCDF handles
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=render_workers, mp_context=context) as executor:
+        for job in jobs:
+            csv_path, title_text, output_name = job[:3]
+            print(f"Processing {title_text}...")
+            result = {'csv_path': csv_path, 'title': title_text, 'success': False,
+                      'seconds': 0.0, 'error': None}
+            results.append(result)
+
+            INSTRUMENTATION.reset()
+            extract_start = time.perf_counter()
+            try:
+                loaded = load_transect(csv_path, geom_file_path, stat_file_path,
+                                       job[3] if len(job) > 3 else None)
+                if loaded is not None and result_store is not None:
+                    with stage('save_result'):
+                        save_transect_result(result_store, *loaded, title_text, stat_file_path,
+                                             output_name, scenario)
+            except Exception:
+                loaded = None
+                result['error'] = traceback.format_exc()
+            result['seconds'] = time.perf_counter() - extract_start
+            result['instrumentation'] = INSTRUMENTATION.summary()
+
+            if loaded is not None:
+                transect_df, df = loaded
+                future = executor.submit(_render_job, transect_df, df, title_text, output_name, output_dir)
+                pending.append((result, future))
+
+        for result, future in pending:
+            try:
+                seconds, render_stages = future.result()
+                result['seconds'] += seconds
+                result['instrumentation']['stages'].update(render_stages)
+                result['success'] = True
+            except Exception:
+                result['error'] = traceback.format_exc()
+    total = time.perf_counter() - start
+
+    _report(results, total, f"{render_workers} rendering worker(s)")
+    return results
+
+
+def _report(results, total, description):
+    """Print per-transect timing and failures"""
+    print(f"\nProcessed {len(results)} transects with {description} in {total:.1f} s")
+    for result in results:
+        status = "OK    " if result['success'] else "FAILED"
+        print(f"  {status} {result['seconds']:7.1f} s  {result['csv_path']}")
+    for result in results:
+        if result['error']:
+            print(f"\nError processing {result['csv_path']}:\n{result['error']}")
+
+
+def process_transect_directory(directory, geom_file_path, stat_file_path, pattern="*.csv",
+                               workers=None, output_dir=".", pipeline=False,
+                               result_store=None, scenario=None, profile_dir=None):
+    """
+    Process every transect file in a directory across a pool of worker processes.
+
+    Args:
+        directory: Folder containing the transect files
+        geom_file_path: Path to the geometry netCDF file
+        stat_file_path: Path to the statistics netCDF file
+        pattern: Glob pattern selecting the transect files
+        workers: Number of worker processes, os.cpu_count() if None
+        output_dir: Folder to save the plots in
+        pipeline: Extract transects in this process and only render in the
+            workers (see run_transects_pipelined), rather than running whole
+            transects in the workers
+        result_store: ResultStore to save each transect's data in, or None
+        scenario: Scenario name to save under, the statistics file name if None
+        profile_dir: Folder to dump a cProfile file per transect in, or None to skip
+            profiling. Not supported with pipeline.
+
+    Returns:
+        list: One result dict per transect, see run_transects
+    """
+    jobs = transect_jobs_from_directory(directory, pattern)
+    if not jobs:
+        print(f"WARNING: No files matching {pattern} in {directory}")
+        return []
+    if pipeline:
+        if profile_dir is not None:
+            print("WARNING: Profiling is not supported with pipeline, no profiles will be saved")
+        return run_transects_pipelined(jobs, geom_file_path, stat_file_path, workers, output_dir,
+                                       result_store, scenario)
+    return run_transects(jobs, geom_file_path, stat_file_path, workers, output_dir,
+                         result_store, scenario, profile_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot every transect in a directory in parallel.")
+    parser.add_argument("directory", help="Folder containing the transect CSV files, shapefiles or GeoPackages")
+    parser.add_argument("--geom", default="../14DayHYD_NoWind_Nash_HD_waqgeom.nc",
+                        help="Path to the geometry netCDF file")
+    parser.add_argument("--stat", default="../deltashell-stat_map.nc",
+                        help="Path to the statistics netCDF file")
+    parser.add_argument("--pattern", default="*.csv",
+                        help="Glob pattern selecting the transect files, e.g. '*.shp' to skip CSV conversion")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--output-dir", default=".", help="Folder to save the plots in")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Extract in this process and render plots in the workers")
+    parser.add_argument("--store", default=None,
+                        help="Folder of a Parquet result store to save the transect data in")
+    parser.add_argument("--scenario", default=None,
+                        help="Scenario name in the result store, the statistics file name by default")
+    parser.add_argument("--timings", default=None,
+                        help="Path of a JSON file to save per-transect stage timings and counters in")
+    parser.add_argument("--profile-dir", default=None,
+                        help="Folder to dump a cProfile file per transect in (not with --pipeline)")
+    args = parser.parse_args()
+
+    store = ResultStore(args.store) if args.store else None
+    results = process_transect_directory(args.directory, args.geom, args.stat, args.pattern,
+                                         args.workers, args.output_dir, args.pipeline,
+                                         store, args.scenario, args.profile_dir)
+    if args.timings:
+        with open(args.timings, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Timings saved to {args.timings}")
+    raise SystemExit(0 if results and all(result['success'] for result in results) else 1)
@@ -0,0 +1,207 @@
+"""
+Benchmark the transect pipeline on synthetic waqgeom and stat_map files.
+
+Generates a mixed triangle/quad mesh for each requested size, then times the
+mesh load (from netCDF and from the mesh cache), element lookup, variable extraction, percentile and plotting stages
+and records their peak Python memory. The report is written as JSON so runs
+can be compared over time.
+
+    python benchmarks/run_benchmarks.py --faces 10000 100000 1000000 --output report.json
+"""
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+# Run from anywhere: the pipeline modules live in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic import (
+    MAP_VARIABLES,
+    STAT_VARIABLES,
+    synthetic_mesh,
+    synthetic_transect,
+    write_geometry,
+    write_map,
+    write_stat_map
+)
+from dataset_pool import DATASET_POOL
+from get_graphs import render_transect_plots
+from helpers import find_element_from_coordinates
+from mesh_cache import clear_mesh_cache
+from mesh_index import MeshIndex, clear_mesh_indexes, get_mesh_index
+from river_transect import RiverTransect
+
+
+@contextlib.contextmanager
+def _stage(stages, name, track_memory=True):
+    """Record the wall time and peak traced memory of a block under stages[name]"""
+    if track_memory:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    yield
+    result = {'seconds': time.perf_counter() - start}
+    if track_memory:
+        result['peak_bytes'] = tracemalloc.get_traced_memory()[1] - start_memory
+    stages[name] = result
+
+
+def run_size(n_faces, n_points, n_times, data_dir, track_memory=True, lookup_points=100, seed=0):
+    """
+    Generate synthetic files for one mesh size and benchmark every stage on them.
+
+    Args:
+        n_faces: Approximate number of mesh faces
+        n_points: Number of transect points
+        n_times: Time steps in the synthetic map file, 0 to skip the empirical percentile stage
+        data_dir: Folder to write the synthetic files in
+        track_memory: Record peak memory with tracemalloc (slows every stage)
+        lookup_points: Points located one at a time with find_element_from_coordinates
+        seed: Random seed
+
+    Returns:
+        dict: Sizes and per-stage 'seconds' and 'peak_bytes'
+    """
+    geom_file_path = os.path.join(data_dir, f'synthetic_{n_faces}_waqgeom.nc')
+    stat_file_path = os.path.join(data_dir, f'synthetic_{n_faces}_stat_map.nc')
+    map_file_path = os.path.join(data_dir, f'synthetic_{n_faces}_map.nc')
+
+    start = time.perf_counter()
+    node_x, node_y, elem_node = synthetic_mesh(n_faces, seed=seed)
+    write_geometry(geom_file_path, node_x, node_y, elem_node)
+    write_stat_map(stat_file_path, node_x, node_y, elem_node, seed=seed)
+    if n_times > 0:
+        write_map(map_file_path, node_x, node_y, elem_node, n_times, seed=seed)
+    generate_seconds = time.perf_counter() - start
+
+    eastings, northings = synthetic_transect(node_x, node_y, n_points)
+    result = {
+        'faces': int(len(elem_node)),
+        'nodes': int(len(node_x)),
+        'triangles': int((elem_node[:, 3] < 0).sum()),
+        'points': int(n_points),
+        'times': int(n_times),
+        'generate_seconds': generate_seconds,
+        'stages': {}
+    }
+    stages = result['stages']
+    print(f"{result['faces']} faces, {n_points} points (generated in {generate_seconds:.1f} s)")
+
+    # Start cold, with no index or open handles left from an earlier size
+    clear_mesh_indexes()
+    DATASET_POOL.close_all()
+
+    with _stage(stages, 'mesh_load', track_memory):
+        MeshIndex(geom_file_path).tree
+
+    # Warm start from the memory-mapped mesh cache (the first load writes it)
+    cache_dir = os.path.join(data_dir, 'cache')
+    clear_mesh_cache(cache_dir)
+    MeshIndex(geom_file_path, cache_dir)
+    with _stage(stages, 'mesh_load_cached', track_memory):
+        MeshIndex(geom_file_path, cache_dir).tree
+    clear_mesh_cache(cache_dir)
+    get_mesh_index(geom_file_path, cache_dir=None)
+
+    lookup = min(lookup_points, n_points)
+    with _stage(stages, 'find_element', track_memory):
+        for easting, northing in zip(eastings[:lookup], northings[:lookup]):
+            find_element_from_coordinates(easting, northing, geom_file_path)
+    stages['find_element']['points'] = lookup
+
+    with _stage(stages, 'locate', track_memory):
+        transect = RiverTransect(eastings, northings, geom_file_path, stat_file_path, cache_dir=None)
+
+    with _stage(stages, 'extract', track_memory):
+        transect.load_variables(STAT_VARIABLES)
+
+    with _stage(stages, 'percentile', track_memory):
+        transect.calculate_statistics([10, 90])
+
+    if n_times > 0:
+        with _stage(stages, 'empirical_percentile', track_memory):
+            transect.calculate_empirical_percentiles(map_file_path, [MAP_VARIABLES[0], MAP_VARIABLES[2]],
+                                                     [10, 90], threshold=3.0)
+
+    with tempfile.TemporaryDirectory() as plot_dir, _stage(stages, 'plot', track_memory):
+        render_transect_plots(transect.df, pd.DataFrame({'id': np.arange(1, n_points + 1)}),
+                              'synthetic transect', 'synthetic', plot_dir)
+
+    result['points_found'] = int(transect.df['element_id'].notna().sum())
+    for name, stage in stages.items():
+        memory = f", peak {stage['peak_bytes'] / 2**20:.1f} MiB" if 'peak_bytes' in stage else ""
+        print(f"  {name:22s} {stage['seconds']:8.3f} s{memory}")
+
+    clear_mesh_indexes()
+    DATASET_POOL.close_all()
+    return result
+
+
+def run_benchmarks(face_counts, n_points=500, n_times=0, data_dir=None, track_memory=True, seed=0):
+    """
+    Benchmark every mesh size in turn.
+
+    Args:
+        face_counts: Approximate face counts of the meshes to generate
+        n_points: Number of transect points
+        n_times: Time steps in the synthetic map files, 0 to skip the empirical percentile stage
+        data_dir: Folder to keep the synthetic files in, a temporary folder if None
+        track_memory: Record peak memory with tracemalloc
+        seed: Random seed
+
+    Returns:
+        dict: The report, with environment details and one entry per size under 'runs'
+    """
+    report = {
+        'created': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'track_memory': track_memory,
+        'runs': []
+    }
+
+    if track_memory:
+        tracemalloc.start()
+    try:
+        with contextlib.ExitStack() as stack:
+            if data_dir is None:
+                data_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            os.makedirs(data_dir, exist_ok=True)
+            for n_faces in face_counts:
+                report['runs'].append(run_size(n_faces, n_points, n_times, data_dir, track_memory, seed=seed))
+    finally:
+        if track_memory:
+            tracemalloc.stop()
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the transect pipeline on synthetic meshes.")
+    parser.add_argument("--faces", type=int, nargs="+", default=[10000, 100000, 1000000],
+                        help="Approximate face counts of the meshes to generate")
+    parser.add_argument("--points", type=int, default=500, help="Number of transect points")
+    parser.add_argument("--times", type=int, default=0,
+                        help="Time steps in a synthetic map file, enables the empirical percentile stage")
+    parser.add_argument("--data-dir", default=None,
+                        help="Folder to keep the synthetic netCDF files in, a temporary folder by default")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="Skip tracemalloc peak memory tracking, which slows every stage")
+    parser.add_argument("--output", default="benchmark_report.json", help="Path of the JSON report")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.faces, args.points, args.times, args.data_dir,
+                            track_memory=not args.no_memory)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report saved to {args.output}")
@@ -0,0 +1,185 @@
+import numpy as np
+import netCDF4
+
+# Fill value used for padding in NetElemNode, as in D-Flow FM waqgeom files
+ELEM_NODE_FILL = -999
+
+# Statistics variables written to the synthetic stat_map file
+STAT_VARIABLES = [f'Mesh2D_2d_{stat}_FullRun_cTR{tracer}'
+                  for stat in ('MEAN', 'STDEV') for tracer in (2, 3, 4)]
+
+# Time-varying variables written to the synthetic map file
+MAP_VARIABLES = [f'Mesh2D_cTR{tracer}' for tracer in (2, 3, 4)]
+
+# Faces per netCDF storage chunk
+FACE_CHUNK = 65536
+
+
+def synthetic_mesh(n_faces, triangle_fraction=0.2, cell_size=20.0, origin=(330000.0, 180000.0),
+                   jitter=0.15, seed=0):
+    """
+    Build a mixed triangle/quad mesh of about n_faces faces.
+    A jittered grid of quads is laid out and a share of the cells is split into
+    two triangles, so faces have 3 or 4 nodes and NetElemNode needs padding.
+
+    Args:
+        n_faces: Approximate number of faces
+        triangle_fraction: Share of the faces that are triangles
+        cell_size: Grid spacing in metres
+        origin: (easting, northing) of the lower left node
+        jitter: Random node displacement as a fraction of cell_size (kept below 0.25 so cells stay convex)
+        seed: Random seed
+
+    Returns:
+        tuple: (node_x, node_y, elem_node) with elem_node 0-based and -1 for padding
+    """
+    rng = np.random.default_rng(seed)
+
+    # A split cell gives two faces, so fewer cells are needed for the same face count
+    n_split_target = int(round(n_faces * triangle_fraction / 2))
+    n_cells = max(1, n_faces - n_split_target)
+    nx = int(np.ceil(np.sqrt(n_cells)))
+    ny = int(np.ceil(n_cells / nx))
+    n_cells = nx * ny
+    n_split = min(max(0, n_faces - n_cells), n_cells)
+
+    # Nodes on a jittered grid, with the boundary left straight
+    x, y = np.meshgrid(np.arange(nx + 1, dtype=np.float64), np.arange(ny + 1, dtype=np.float64))
+    interior = (x > 0) & (x < nx) & (y > 0) & (y < ny)
+    x[interior] += rng.uniform(-jitter, jitter, interior.sum())
+    y[interior] += rng.uniform(-jitter, jitter, interior.sum())
+    node_x = origin[0] + cell_size * x.ravel()
+    node_y = origin[1] + cell_size * y.ravel()
+
+    # Corner nodes of every cell, anticlockwise
+    j, i = np.divmod(np.arange(n_cells), nx)
+    a = j * (nx + 1) + i
+    b = a + 1
+    c = a + nx + 2
+    d = a + nx + 1
+
+    split = np.zeros(n_cells, dtype=bool)
+    split[rng.choice(n_cells, n_split, replace=False)] = True
+
+    # Faces stay in cell order, with the two triangles of a split cell together
+    first = np.concatenate(([0], np.cumsum(1 + split)[:-1]))
+    elem_node = np.full((n_cells + n_split, 4), -1, dtype=np.int64)
+    elem_node[first] = np.column_stack((a, b, c, np.where(split, -1, d)))
+    elem_node[first[split] + 1] = np.column_stack((a[split], c[split], d[split], np.full(n_split, -1)))
+
+    return node_x, node_y, elem_node
+
+
+def write_geometry(path, node_x, node_y, elem_node):
+    """
+    Write a mesh as a waqgeom-style netCDF file (NetNode_x, NetNode_y, NetElemNode).
+
+    Args:
+        path: Output file path
+        node_x: Node eastings
+        node_y: Node northings
+        elem_node: 0-based connectivity with -1 for padding
+    """
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('nNetNode', len(node_x))
+        nc.createDimension('nNetElem', len(elem_node))
+        nc.createDimension('nNetElemMaxNode', elem_node.shape[1])
+
+        nc.createVariable('NetNode_x', 'f8', ('nNetNode',))[:] = node_x
+        nc.createVariable('NetNode_y', 'f8', ('nNetNode',))[:] = node_y
+
+        variable = nc.createVariable('NetElemNode', 'i4', ('nNetElem', 'nNetElemMaxNode'),
+                                     fill_value=ELEM_NODE_FILL,
+                                     chunksizes=(min(FACE_CHUNK, len(elem_node)), elem_node.shape[1]))
+        variable.start_index = 1
+        variable[:] = np.where(elem_node >= 0, elem_node + 1, ELEM_NODE_FILL).astype(np.int32)
+
+
+def _smooth_field(node_x, node_y, elem_node, rng, low, high):
+    """Spatially smooth positive values per face, from the face centroids"""
+    valid = elem_node >= 0
+    safe = np.where(valid, elem_node, 0)
+    count = valid.sum(axis=1)
+    cx = np.where(valid, node_x[safe], 0).sum(axis=1) / count
+    cy = np.where(valid, node_y[safe], 0).sum(axis=1) / count
+
+    span = max(np.ptp(node_x), np.ptp(node_y), 1.0)
+    phase = rng.uniform(0, 2 * np.pi, 2)
+    wave = np.sin(2 * np.pi * cx / span + phase[0]) * np.cos(2 * np.pi * cy / span + phase[1])
+    return low + (high - low) * (wave + 1) / 2
+
+
+def write_stat_map(path, node_x, node_y, elem_node, seed=0):
+    """
+    Write a stat_map-style netCDF file with MEAN and STDEV of cTR2, cTR3 and cTR4.
+
+    Args:
+        path: Output file path
+        node_x: Node eastings
+        node_y: Node northings
+        elem_node: 0-based connectivity with -1 for padding
+        seed: Random seed
+    """
+    rng = np.random.default_rng(seed)
+    n_faces = len(elem_node)
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('time', 1)
+        nc.createDimension('nMesh2D_faces', n_faces)
+        for name in STAT_VARIABLES:
+            low, high = (0.5, 6.0) if 'MEAN' in name else (0.1, 1.5)
+            variable = nc.createVariable(name, 'f8', ('time', 'nMesh2D_faces'), fill_value=-999.0,
+                                         chunksizes=(1, min(FACE_CHUNK, n_faces)))
+            variable[0, :] = _smooth_field(node_x, node_y, elem_node, rng, low, high)
+
+
+def write_map(path, node_x, node_y, elem_node, n_times, seed=0, time_chunk=24):
+    """
+    Write a map-style netCDF file with time series of cTR2, cTR3 and cTR4 on every face.
+    Values are written in blocks of time_chunk steps, so memory stays bounded
+    for large meshes.
+
+    Args:
+        path: Output file path
+        node_x: Node eastings
+        node_y: Node northings
+        elem_node: 0-based connectivity with -1 for padding
+        n_times: Number of time steps
+        seed: Random seed
+        time_chunk: Time steps per netCDF storage chunk
+    """
+    rng = np.random.default_rng(seed)
+    n_faces = len(elem_node)
+    time_chunk = max(1, min(time_chunk, n_times))
+    with netCDF4.Dataset(path, 'w') as nc:
+        nc.createDimension('time', n_times)
+        nc.createDimension('nMesh2D_faces', n_faces)
+        for name in MAP_VARIABLES:
+            base = _smooth_field(node_x, node_y, elem_node, rng, 0.5, 4.0)
+            variable = nc.createVariable(name, 'f4', ('time', 'nMesh2D_faces'), fill_value=-999.0,
+                                         chunksizes=(time_chunk, min(FACE_CHUNK, n_faces)))
+            for start in range(0, n_times, time_chunk):
+                stop = min(start + time_chunk, n_times)
+                noise = rng.lognormal(0.0, 0.4, (stop - start, n_faces))
+                variable[start:stop, :] = (base[None, :] * noise).astype(np.float32)
+
+
+def synthetic_transect(node_x, node_y, n_points, margin=0.05):
+    """
+    Points along a meandering line across the mesh, from corner to corner.
+
+    Args:
+        node_x: Node eastings
+        node_y: Node northings
+        n_points: Number of points
+        margin: Share of the domain left clear at each edge
+
+    Returns:
+        tuple: (eastings, northings) arrays
+    """
+    x0, x1 = np.min(node_x), np.max(node_x)
+    y0, y1 = np.min(node_y), np.max(node_y)
+    t = np.linspace(margin, 1 - margin, n_points)
+    meander = 0.05 * np.sin(6 * np.pi * t)
+    eastings = x0 + (x1 - x0) * np.clip(t + meander, 0, 1)
+    northings = y0 + (y1 - y0) * np.clip(t - meander, 0, 1)
+    return eastings, northings
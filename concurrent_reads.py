@@ -0,0 +1,48 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from helpers import _element_lookup, _read_element_values, get_values_for_elements
+from instrumentation import timed
+
+# netCDF-C, and the HDF5 library bundled with netCDF4, are not thread-safe: two
+# threads inside them at once, even on different files, can corrupt reads or
+# crash the interpreter, and a thread-safe HDF5 build does not make netCDF-C
+# safe. Reads therefore only run in parallel in separate processes, one file
+# per task, which is worth it for many large files (e.g. one per scenario)
+# rather than for a few variables of one file.
+
+
+@timed('read_variables')
+def read_variables_concurrently(element_ids, requests, time_index=0, max_workers=1, max_gap_ratio=4):
+    """
+    Read variables from one or several statistics files on the same mesh.
+    With max_workers 1 the element IDs are mapped once and each file is read
+    in turn through the shared dataset pool. Otherwise each file is read in
+    its own worker process, up to max_workers at a time.
+
+    Args:
+        element_ids: Array of element IDs, with -1 (or None) for missing elements
+        requests: Dict of statistics file path to the variable names to read from it
+        time_index: Index of the first (time) dimension to read
+        max_workers: Maximum number of worker processes, 1 to read in this process
+        max_gap_ratio: Read a contiguous slice when it is at most this many
+            times longer than the number of unique element IDs (see read_element_block)
+
+    Returns:
+        dict: File path to a dict of variable name to float array of values, one
+        per element ID, with NaN for missing elements and masked values. Variables
+        not found are left out.
+    """
+    max_workers = max(1, min(max_workers, len(requests)))
+
+    if max_workers == 1:
+        lookup = _element_lookup(element_ids)
+        return {path: _read_element_values(path, names, lookup, time_index, max_gap_ratio)
+                for path, names in requests.items()}
+
+    # Spawned workers do not inherit this process's open netCDF handles
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+        futures = {path: executor.submit(get_values_for_elements, element_ids, names, path,
+                                         time_index, max_gap_ratio)
+                   for path, names in requests.items()}
+        return {path: future.result() for path, future in futures.items()}
@@ -0,0 +1,166 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import netCDF4
+
+
+class DatasetPool:
+    """
+    Pool of long-lived netCDF dataset handles with least-recently-used eviction.
+    Opening HDF5-backed files is slow, especially on network storage, so handles
+    are kept open between calls. Handles in use are never evicted, and a handle
+    is reopened if its file changes on disk.
+    """
+    def __init__(self, max_open=8):
+        """
+        Initialize an empty pool.
+
+        Args:
+            max_open: Maximum number of idle handles to keep open
+        """
+        self.max_open = max_open
+        self._handles = OrderedDict()  # path -> [dataset, file signature, users]
+        self._lock = threading.RLock()
+
+        # Counters
+        self.opens = 0
+        self.hits = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _signature(path):
+        """Modification time and size of a file, used to detect changes"""
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def acquire(self, file_path):
+        """
+        Get an open handle for a file, opening it if needed.
+        Every acquire must be paired with a release; prefer the dataset() context manager.
+
+        Args:
+            file_path: Path to the netCDF file
+
+        Returns:
+            netCDF4.Dataset: The open dataset
+        """
+        path = os.path.abspath(file_path)
+        signature = self._signature(path)
+
+        with self._lock:
+            entry = self._handles.get(path)
+            if entry is not None and entry[1] != signature and entry[2] == 0:
+                # File changed on disk since it was opened
+                entry[0].close()
+                del self._handles[path]
+                entry = None
+
+            if entry is not None:
+                self.hits += 1
+            else:
+                entry = [netCDF4.Dataset(path), signature, 0]
+                self._handles[path] = entry
+                self.opens += 1
+
+            entry[2] += 1
+            self._handles.move_to_end(path)
+            self._evict()
+            return entry[0]
+
+    def release(self, file_path):
+        """
+        Mark a handle from acquire() as no longer in use.
+
+        Args:
+            file_path: Path to the netCDF file
+        """
+        path = os.path.abspath(file_path)
+        with self._lock:
+            entry = self._handles.get(path)
+            if entry is not None:
+                entry[2] -= 1
+            self._evict()
+
+    @contextmanager
+    def dataset(self, file_path):
+        """
+        Context manager giving a pooled handle for a file.
+
+        Args:
+            file_path: Path to the netCDF file
+
+        Yields:
+            netCDF4.Dataset: The open dataset, which must not be closed by the caller
+        """
+        nc = self.acquire(file_path)
+        try:
+            yield nc
+        finally:
+            self.release(file_path)
+
+    def _evict(self):
+        """Close least recently used idle handles until the pool is within max_open"""
+        excess = len(self._handles) - self.max_open
+        if excess <= 0:
+            return
+        for path in list(self._handles):
+            if excess <= 0:
+                break
+            entry = self._handles[path]
+            if entry[2] > 0:
+                continue  # Still in use
+            entry[0].close()
+            del self._handles[path]
+            self.evictions += 1
+            excess -= 1
+
+    def close_all(self):
+        """Close every handle in the pool"""
+        with self._lock:
+            for entry in self._handles.values():
+                try:
+                    entry[0].close()
+                except RuntimeError:
+                    pass  # Already closed
+            self._handles.clear()
+
+    def stats(self):
+        """
+        Get the pool counters.
+
+        Returns:
+            dict: Number of opens, hits and evictions, and handles currently open
+        """
+        with self._lock:
+            return {
+                'opens': self.opens,
+                'hits': self.hits,
+                'evictions': self.evictions,
+                'open_handles': len(self._handles)
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_all()
+
+
+# Pool shared by the whole process
+DATASET_POOL = DatasetPool()
+atexit.register(DATASET_POOL.close_all)
+
+
+def open_dataset(file_path):
+    """
+    Get a pooled handle for a netCDF file from the shared pool.
+
+    Args:
+        file_path: Path to the netCDF file
+
+    Returns:
+        Context manager yielding the open netCDF4.Dataset
+    """
+    return DATASET_POOL.dataset(file_path)
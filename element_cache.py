@@ -0,0 +1,128 @@
+import hashlib
+import os
+import shutil
+import uuid
+import numpy as np
+from instrumentation import count
+
+# Default location of the on-disk cache, relative to the working directory
+DEFAULT_CACHE_DIR = ".delft_cache"
+
+# Content hashes already computed in this process, keyed by file path
+_FILE_HASHES = {}
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """
+    Compute the SHA-256 hash of a file's contents.
+    The hash is remembered for the life of the process and only recomputed
+    if the file's modification time or size changes.
+
+    Args:
+        file_path: Path to the file
+        block_size: Number of bytes to read at a time
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    key = os.path.abspath(file_path)
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _FILE_HASHES.get(key)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    with open(key, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+
+    _FILE_HASHES[key] = (signature, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _cache_path(geom_file_path, eastings, northings, cache_dir):
+    """
+    Build the cache file path for a set of points on a mesh.
+    Entries live in a folder named after the geometry file's content hash,
+    so a changed mesh never reads entries written for the old one.
+    """
+    geom_hash = file_content_hash(geom_file_path)
+
+    coords = hashlib.sha256()
+    coords.update(np.ascontiguousarray(eastings, dtype=np.float64).tobytes())
+    coords.update(np.ascontiguousarray(northings, dtype=np.float64).tobytes())
+
+    return os.path.join(cache_dir, "element_ids", geom_hash, f"{coords.hexdigest()}.npy")
+
+
+def load_cached_element_ids(geom_file_path, eastings, northings, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load previously resolved element IDs for a set of points.
+
+    Args:
+        geom_file_path: Path to the geometry netCDF file
+        eastings: Array of X coordinates
+        northings: Array of Y coordinates
+        cache_dir: Folder holding the cache
+
+    Returns:
+        numpy.ndarray: Element ID for each point (-1 where none was found),
+        or None if the points have not been cached for this mesh
+    """
+    path = _cache_path(geom_file_path, eastings, northings, cache_dir)
+    if not os.path.exists(path):
+        count('element_cache_misses')
+        return None
+
+    try:
+        element_ids = np.load(path)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring unreadable element cache {path}: {e}")
+        count('element_cache_misses')
+        return None
+
+    if len(element_ids) != len(eastings):
+        count('element_cache_misses')
+        return None
+    count('element_cache_hits')
+    return element_ids
+
+
+def save_cached_element_ids(geom_file_path, eastings, northings, element_ids, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Store resolved element IDs for a set of points.
+
+    Args:
+        geom_file_path: Path to the geometry netCDF file
+        eastings: Array of X coordinates
+        northings: Array of Y coordinates
+        element_ids: Element ID for each point, -1 where none was found
+        cache_dir: Folder holding the cache
+    """
+    path = _cache_path(geom_file_path, eastings, northings, cache_dir)
+
+    # Write to a temporary file first so a reader never sees a partial entry
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.asarray(element_ids, dtype=np.int64))
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write element ID cache {path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def clear_element_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Delete all cached element IDs.
+
+    Args:
+        cache_dir: Folder holding the cache
+    """
+    shutil.rmtree(os.path.join(cache_dir, "element_ids"), ignore_errors=True)
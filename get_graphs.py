@@ -1,6 +1,9 @@
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
 from river_transect import RiverTransect
+from instrumentation import profile, stage, timed
+from transect_files import is_transect_file, read_transects
 import os
 
 def plot_din_stats(ax, transect_df, df, title_text):
@@ -112,32 +115,54 @@ def plot_bod(ax, transect_df, df, title_text):
     
     return ax
 
-def process_transect(csv_path, title_text, geom_file_path, stat_file_path):
+def read_transect_points(path, feature=None):
     """
-    Process a single transect CSV file and create plots.
+    Read transect points from a shapefile or GeoPackage.
     
     Args:
-        csv_path: Path to the CSV file with transect coordinates
-        title_text: Text to use in plot titles (e.g., "Cross Section 1")
+        path: Shapefile or GeoPackage path
+        feature: Index of the line feature to read, or None for a point layer
+            (or a line layer with a single feature)
+        
+    Returns:
+        pandas.DataFrame: 'id', 'E' and 'N' columns, as in the transect CSV files
+    """
+    transects = read_transects(path, feature=feature)
+    if len(transects) != 1:
+        raise ValueError(f"{path} holds {len(transects)} transects, choose one with feature")
+    transect = transects[0]
+    return pd.DataFrame({'id': transect['id'], 'E': transect['easting'], 'N': transect['northing']})
+
+def load_transect(csv_path, geom_file_path, stat_file_path, feature=None):
+    """
+    Read a transect file and calculate all DIN and BOD statistics along it.
+    
+    Args:
+        csv_path: Path to the transect file: a CSV file with id, E and N columns,
+            or a shapefile or GeoPackage read directly
         geom_file_path: Path to the geometry netCDF file
         stat_file_path: Path to the statistics netCDF file
+        feature: Index of the feature to use in a line shapefile or GeoPackage
         
     Returns:
-        bool: True if successful, False otherwise
+        tuple: (transect_df, df) DataFrame from the RiverTransect and the original
+        CSV DataFrame, or None if the file could not be read
     """
-    print(f"Processing {title_text}...")
-    
     # Check if the file exists
     if not os.path.exists(csv_path):
         print(f"WARNING: File {csv_path} not found. Skipping.")
-        return False
+        return None
     
     # Read the CSV file
     try:
-        df = pd.read_csv(csv_path)
+        with stage('read_points'):
+            if is_transect_file(csv_path):
+                df = read_transect_points(csv_path, feature)
+            else:
+                df = pd.read_csv(csv_path)
     except Exception as e:
         print(f"ERROR: Could not read {csv_path}: {e}")
-        return False
+        return None
     
     # Extract eastings and northings
     try:
@@ -145,97 +170,158 @@ def process_transect(csv_path, title_text, geom_file_path, stat_file_path):
         northings = df["N"].tolist()
     except KeyError as e:
         print(f"ERROR: CSV file missing required columns: {e}")
-        return False
+        return None
     
     print(f"Read {len(eastings)} points from {csv_path}")
     
     # Create a transect with points from the CSV
     transect = RiverTransect(eastings, northings, geom_file_path=geom_file_path, stat_file_path=stat_file_path)
     
-    # Calculate DIN mean and standard deviation
-    transect.get_din()
-    transect.get_din_std_dev()
+    # Calculate DIN and BOD statistics, percentiles, baselines and WFD thresholds
+    transect.calculate_statistics([10, 90])
     
-    # Calculate 10th and 90th percentiles for DIN
-    transect.calculate_din_percentile(10)
-    transect.calculate_din_percentile(90)
+    return transect.df, df
+
+def plot_filename_bases(title_text, output_name=None):
+    """
+    Get the DIN and BOD plot filename bases for a transect.
     
-    # Add DIN baseline
-    transect.add_din_baseline()
+    Args:
+        title_text: Text used in plot titles
+        output_name: Name used in the plot filenames, derived from title_text if None
+        
+    Returns:
+        tuple: (din_filename_base, bod_filename_base)
+    """
+    if output_name is not None:
+        return f"din_{output_name}", f"bod_{output_name}"
+    if "cross section" in title_text:
+        section_num = title_text.split()[-1]
+        return f"din_cross_section_{section_num}", f"bod_cross_section_{section_num}"
+    return "din_centreline", "bod_centreline"
+
+@timed('render')
+def render_transect_plots(transect_df, df, title_text, output_name=None, output_dir="."):
+    """
+    Render the DIN and BOD plots for a processed transect to PNG files.
+    Uses the object-oriented Agg API rather than pyplot, so it holds no global
+    state and is safe to run in worker processes or threads.
     
-    # Calculate WFD performance
-    transect.wfd_performance()
+    Args:
+        transect_df: DataFrame from RiverTransect object
+        df: Original CSV DataFrame (for point IDs)
+        title_text: Text to use in plot titles
+        output_name: Name used in the plot filenames, derived from title_text if None
+        output_dir: Folder to save the plots in
+        
+    Returns:
+        list: Paths of the saved plots
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    din_filename_base, bod_filename_base = plot_filename_bases(title_text, output_name)
+    
+    plots = [
+        # Just DIN statistics (without WFD guidelines)
+        (plot_din_stats, f"{din_filename_base}_stats.png"),
+        # DIN statistics with WFD guidelines
+        (plot_din_with_wfd, f"{din_filename_base}_with_wfd.png"),
+        # Just BOD statistics
+        (plot_bod, f"{bod_filename_base}_stats.png"),
+    ]
+    
+    filenames = []
+    for plot_function, filename in plots:
+        fig = Figure(figsize=(12, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot()
+        plot_function(ax, transect_df, df, title_text)
+        fig.tight_layout()
+        
+        plot_filename = os.path.join(output_dir, filename)
+        fig.savefig(plot_filename, dpi=300)
+        print(f"Plot saved to {plot_filename}")
+        filenames.append(plot_filename)
     
-    # Calculate BOD mean, standard deviation, and percentiles
-    transect.get_bod()
-    transect.calculate_bod_percentile(10)
-    transect.calculate_bod_percentile(90)
+    return filenames
+
+def save_transect_result(result_store, transect_df, df, title_text, stat_file_path,
+                         output_name=None, scenario=None):
+    """
+    Save a processed transect to a result store so it can be re-plotted later.
     
-    # Add BOD baseline
-    transect.add_bod_baseline()
+    Args:
+        result_store: ResultStore to save in
+        transect_df: DataFrame from RiverTransect object
+        df: Original CSV DataFrame (for point IDs)
+        title_text: Text used in plot titles, the transect name if output_name is None
+        stat_file_path: Path to the statistics netCDF file
+        output_name: Name of the transect in the store
+        scenario: Scenario name, the statistics file name if None
+    """
+    if scenario is None:
+        scenario = os.path.splitext(os.path.basename(stat_file_path))[0]
+    transect = output_name if output_name is not None else title_text
+    point_ids = df['id'] if 'id' in df.columns else None
+    result_store.save(transect_df, scenario, transect, point_ids)
+
+def process_transect(csv_path, title_text, geom_file_path, stat_file_path,
+                     output_name=None, output_dir=".", result_store=None, scenario=None,
+                     profile_path=None, feature=None):
+    """
+    Process a single transect file and create plots.
     
-    # Generate filename base from title_text
-    if "cross section" in title_text:
-        section_num = title_text.split()[-1]
-        din_filename_base = f"din_cross_section_{section_num}"
-        bod_filename_base = f"bod_cross_section_{section_num}"
-    else:
-        din_filename_base = "din_centreline"
-        bod_filename_base = "bod_centreline"
-    
-    # ------------------------------------------------------------------------
-    # PLOT 1: Just DIN statistics (without WFD guidelines)
-    # ------------------------------------------------------------------------
-    fig1, ax1 = plt.subplots(figsize=(12, 7))
-    plot_din_stats(ax1, transect.df, df, title_text)
-    plt.tight_layout()
-    
-    plot1_filename = f"{din_filename_base}_stats.png"
-    plt.savefig(plot1_filename, dpi=300)
-    print(f"Plot saved to {plot1_filename}")
-    
-    # ------------------------------------------------------------------------
-    # PLOT 2: DIN statistics with WFD guidelines
-    # ------------------------------------------------------------------------
-    fig2, ax2 = plt.subplots(figsize=(12, 7))
-    plot_din_with_wfd(ax2, transect.df, df, title_text)
-    plt.tight_layout()
-    
-    plot2_filename = f"{din_filename_base}_with_wfd.png"
-    plt.savefig(plot2_filename, dpi=300)
-    print(f"Plot saved to {plot2_filename}")
-    
-    # ------------------------------------------------------------------------
-    # PLOT 3: Just BOD Statistics
-    # ------------------------------------------------------------------------
-    fig3, ax3 = plt.subplots(figsize=(12, 7))
-    plot_bod(ax3, transect.df, df, title_text)
-    plt.tight_layout()
-    
-    plot3_filename = f"{bod_filename_base}_stats.png"
-    plt.savefig(plot3_filename, dpi=300)
-    print(f"Plot saved to {plot3_filename}")
-    
-    plt.close('all')
+    Args:
+        csv_path: Path to the transect file (CSV, shapefile or GeoPackage)
+        title_text: Text to use in plot titles (e.g., "Cross Section 1")
+        geom_file_path: Path to the geometry netCDF file
+        stat_file_path: Path to the statistics netCDF file
+        output_name: Name used in the plot filenames (e.g. "cross_section_1"),
+            derived from title_text if None
+        output_dir: Folder to save the plots in
+        result_store: ResultStore to save the transect data in, or None to only plot
+        scenario: Scenario name to save under, the statistics file name if None
+        profile_path: File to dump cProfile statistics of the run to, or None to skip profiling.
+            Stage timings are always recorded, see instrumentation.INSTRUMENTATION.
+        feature: Index of the feature to use in a line shapefile or GeoPackage
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    if profile_path is not None:
+        with profile(profile_path):
+            return process_transect(csv_path, title_text, geom_file_path, stat_file_path,
+                                    output_name, output_dir, result_store, scenario, feature=feature)
+    
+    print(f"Processing {title_text}...")
+    
+    with stage('process_transect'):
+        loaded = load_transect(csv_path, geom_file_path, stat_file_path, feature)
+        if loaded is None:
+            return False
+        
+        transect_df, df = loaded
+        if result_store is not None:
+            with stage('save_result'):
+                save_transect_result(result_store, transect_df, df, title_text, stat_file_path,
+                                     output_name, scenario)
+        render_transect_plots(transect_df, df, title_text, output_name, output_dir)
     return True
 
 # Main execution
 if __name__ == "__main__":
+    from batch_transects import run_transects_pipelined
+    
     # Set file paths for all transects
     geom_file_path = "../14DayHYD_NoWind_Nash_HD_waqgeom.nc"
     stat_file_path = "../deltashell-stat_map.nc"
     
-    # Process centreline first
-    centreline_path = "Usk_Transects/Centreline.csv"
-    process_transect(centreline_path, "the centreline section of the Usk", geom_file_path, stat_file_path)
+    # Centreline first, then each cross section (1 through 6)
+    jobs = [("Usk_Transects/Centreline.csv", "the centreline section of the Usk", "centreline")]
+    jobs += [(f"Usk_Transects/Cross_Section_{i}.csv", f"horizontal cross section {i}", f"cross_section_{i}")
+             for i in range(1, 7)]
     
-    # Process each cross section
-    for i in range(1, 7):  # 1 through 6
-        try:
-            csv_path = f"Usk_Transects/Cross_Section_{i}.csv"
-            process_transect(csv_path, f"horizontal cross section {i}", geom_file_path, stat_file_path)
-        except Exception as e:
-            print(f"Error processing cross section {i}: {e}")
+    # Extract each transect while the previous one's plots render in the background
+    results = run_transects_pipelined(jobs, geom_file_path, stat_file_path)
     
-    print("Success")
-
+    if all(result['success'] for result in results):
+        print("Success")
@@ -1,11 +1,35 @@
-import netCDF4
 import numpy as np
-from shapely.geometry import Point, Polygon
+from scipy import stats
+from dataset_pool import open_dataset
+from instrumentation import count, timed
+from mesh_index import get_mesh_index
+from stat_reader import element_id_array, read_element_block
 
 #TODO: A function which calculates 90th, 10th percentile for a given element ID.
 # Function which takes in a ordered list of eastings and northings, and produces the x axis (ie distance across the river)
 # A function which takes in an ordered list of eastings and northings, and a variable (e.g. mean/90th percentile) and produces the graph. 
 
+# Statistics file variables behind DIN (cTR2 + cTR4) and BOD (cTR3)
+DIN_MEAN_VARIABLES = ['Mesh2D_2d_MEAN_FullRun_cTR2', 'Mesh2D_2d_MEAN_FullRun_cTR4']
+DIN_STDEV_VARIABLES = ['Mesh2D_2d_STDEV_FullRun_cTR2', 'Mesh2D_2d_STDEV_FullRun_cTR4']
+BOD_MEAN_VARIABLE = 'Mesh2D_2d_MEAN_FullRun_cTR3'
+BOD_STDEV_VARIABLE = 'Mesh2D_2d_STDEV_FullRun_cTR3'
+
+# Upper DIN limit (mg N/l) of each WFD class, best class first
+WFD_DIN_THRESHOLDS = {
+    'WFD High': 0.282,
+    'WFD Good': 3.807,
+    'WFD Moderate': 5.7105,
+    'WFD Poor': 8.56575
+}
+
+# WFD class names indexed by the codes returned by classify_wfd_din
+WFD_CLASSES = ['High', 'Good', 'Moderate', 'Poor', 'Bad']
+
+# 10 percent plus baseline values
+DIN_BASELINE = 0.88
+BOD_BASELINE = 4.4
+
 
 def calculate_distance(easting1, northing1, easting2, northing2):
     """
@@ -44,94 +68,128 @@ def calculate_path_distances(eastings, northings):
     if len(eastings) < 2:
         return [0] * len(eastings)  # If only one point or empty, return zeros
     
-    # Initialize distances list with 0 for the first point
-    cumulative_distances = [0]
-    
-    # Calculate cumulative distances
-    total_distance = 0
-    for i in range(1, len(eastings)):
-        # Calculate distance from previous point
-        segment_distance = calculate_distance(
-            eastings[i-1], northings[i-1], 
-            eastings[i], northings[i]
-        )
-        
-        # Add to total
-        total_distance += segment_distance
-        
-        # Append to list
-        cumulative_distances.append(total_distance)
+    # Distance of each segment, accumulated from 0 at the first point
+    eastings = np.asarray(eastings, dtype=np.float64)
+    northings = np.asarray(northings, dtype=np.float64)
+    segment_distances = calculate_distance(eastings[:-1], northings[:-1], eastings[1:], northings[1:])
+    cumulative_distances = np.concatenate(([0.0], np.cumsum(segment_distances)))
     
-    return cumulative_distances
+    return cumulative_distances.tolist()
 
-def find_element_from_coordinates(easting, northing, geom_file_path="../14DayHYD_NoWind_Nash_HD_waqgeom.nc"):
+def densify_polyline(eastings, northings, spacing, keep_vertices=True):
     """
-    Find the mesh element ID containing the given coordinates.
-    Uses spatial filtering to only check elements with nodes within search_radius.
+    Resample a polyline at a regular spacing along its length.
     
     Args:
-        easting: X coordinate (easting)
-        northing: Y coordinate (northing)
-        geom_file_path: Path to the geometry netCDF file
+        eastings: List/array of X coordinates of the polyline vertices
+        northings: List/array of Y coordinates of the polyline vertices
+        spacing: Distance between samples, in the same units as the coordinates
+        keep_vertices: Also sample at every original vertex, so the shape is kept exactly
         
     Returns:
-        int: Element ID if found, None if not found
-        
-    Note:
-        If no element is found, consider increasing the search radius value. 
+        tuple: (eastings, northings, chainages) arrays of the samples, where chainage
+        is the exact distance along the polyline from its first vertex
     """
-    search_radius = 150  # Radius in meters to search for nearby nodes
-
-    # Open the geometry file
-    nc = netCDF4.Dataset(geom_file_path)
+    if spacing <= 0:
+        raise ValueError("Spacing must be positive")
     
-    # Get node coordinates
-    x = nc.variables["NetNode_x"][:]
-    y = nc.variables["NetNode_y"][:]
-    
-    # Get element-to-node connectivity
-    # NetElemNode is usually shape (nElem, nNodesPerElem), 1-based with -1 as fill value
-    elem_node = nc.variables["NetElemNode"][:] - 1  # Convert to 0-based
+    eastings = np.asarray(eastings, dtype=np.float64)
+    northings = np.asarray(northings, dtype=np.float64)
+    vertex_chainages = np.array(calculate_path_distances(eastings, northings), dtype=np.float64)
+    if len(eastings) < 2:
+        return eastings, northings, vertex_chainages
     
-    # Remove padding/fill values (-1) per element
-    elem_node = np.ma.filled(elem_node, -1)
+    total = vertex_chainages[-1]
+    chainages = np.append(np.arange(0.0, total, spacing), total)
+    if keep_vertices:
+        chainages = np.union1d(chainages, vertex_chainages)
     
-    # Convert coordinates to a shapely Point
-    point = Point(easting, northing)
+    return (np.interp(chainages, vertex_chainages, eastings),
+            np.interp(chainages, vertex_chainages, northings),
+            chainages)
+
+def lognormal_parameters(mean, std_dev):
+    """
+    Calculate the parameters of the normal distribution underlying a log-normal
+    distribution with the given mean and standard deviation.
+    For a log-normal distribution with mean m and variance s²:
+    μ = ln(m²/√(m² + s²))
+    σ = √(ln(1 + s²/m²))
     
-    # Create a spatial filter to identify nearby nodes
-    node_distances = np.sqrt((x - easting)**2 + (y - northing)**2)
-    nearby_nodes = np.where(node_distances <= search_radius)[0]
+    Args:
+        mean: Array of means
+        std_dev: Array of standard deviations
+        
+    Returns:
+        tuple: (mu, sigma) arrays, NaN where the mean or standard deviation is
+        missing or the mean is not positive
+    """
+    m = np.asarray(mean, dtype=np.float64)
+    s = np.asarray(std_dev, dtype=np.float64)
     
-    # Create a set of nearby nodes for faster lookup
-    nearby_nodes_set = set(nearby_nodes)
+    # Mask null values and zeros
+    valid = ~np.isnan(m) & ~np.isnan(s) & (m > 0)
+    m = np.where(valid, m, np.nan)
+    s = np.where(valid, s, np.nan)
     
-    # Only check elements that contain at least one nearby node
-    found_elem = None
-    elements_checked = 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mu = np.log(m**2 / np.sqrt(m**2 + s**2))
+        sigma = np.sqrt(np.log(1 + (s**2 / m**2)))
+    return mu, sigma
+
+@timed('percentiles')
+def lognormal_percentiles(mean, std_dev, percentiles):
+    """
+    Calculate several percentiles of log-normal distributions in one array operation.
     
-    for elem_idx, node_ids in enumerate(elem_node):
-        # Filter out padding values
-        valid_ids = node_ids[node_ids >= 0]
+    Args:
+        mean: Array of means
+        std_dev: Array of standard deviations
+        percentiles: Percentiles to calculate (e.g., [10, 90])
         
-        # Check if any node in this element is nearby
-        if not any(node_id in nearby_nodes_set for node_id in valid_ids):
-            continue
-            
-        # This element has at least one nearby node, check if it contains the point
-        elements_checked += 1
-        poly_coords = list(zip(x[valid_ids], y[valid_ids]))
+    Returns:
+        dict: Percentile to array of values, NaN where the inputs are missing
+        or the mean is not positive
+    """
+    percentiles = list(percentiles)
+    mu, sigma = lognormal_parameters(mean, std_dev)
+    
+    # One z-score per percentile, broadcast against every point at once
+    z = stats.norm.ppf(np.asarray(percentiles, dtype=np.float64) / 100.0)
+    values = np.exp(mu[None, ...] + sigma[None, ...] * z.reshape((-1,) + (1,) * mu.ndim))
+    
+    return {percentile: values[i] for i, percentile in enumerate(percentiles)}
+
+def classify_wfd_din(din):
+    """
+    Classify DIN concentrations into WFD classes.
+    
+    Args:
+        din: Array of DIN concentrations (mg N/l)
         
-        if len(poly_coords) < 3:
-            continue  # Not a valid polygon
-            
-        polygon = Polygon(poly_coords)
-        if polygon.contains(point):
-            found_elem = elem_idx
-            break
+    Returns:
+        numpy.ndarray: Index into WFD_CLASSES for each value (0 = High ... 4 = Bad),
+        -1 where the concentration is missing
+    """
+    din = np.asarray(din, dtype=np.float64)
+    classes = np.searchsorted(np.array(list(WFD_DIN_THRESHOLDS.values())), din, side='left')
+    return np.where(np.isnan(din), -1, classes).astype(np.int8)
+
+@timed('find_element')
+def find_element_from_coordinates(easting, northing, geom_file_path="../14DayHYD_NoWind_Nash_HD_waqgeom.nc"):
+    """
+    Find the mesh element ID containing the given coordinates.
+    Uses the shared MeshIndex for the geometry file, so the file is only read once.
     
-    nc.close()
-    return found_elem
+    Args:
+        easting: X coordinate (easting)
+        northing: Y coordinate (northing)
+        geom_file_path: Path to the geometry netCDF file
+        
+    Returns:
+        int: Element ID if found, None if not found
+    """
+    return get_mesh_index(geom_file_path).find_element(easting, northing)
 
 def get_value_for_element(element_id, variable_name, stat_file_path="../deltashell-stat_map.nc"):
     """
@@ -145,25 +203,82 @@ def get_value_for_element(element_id, variable_name, stat_file_path="../deltashe
     Returns:
         The value of the variable at the specified element, or None if not found
     """
-    # Open the statistics file
-    stat_nc = netCDF4.Dataset(stat_file_path)
+    # Get a pooled handle for the statistics file
+    with open_dataset(stat_file_path) as stat_nc:
+        # Check if the variable exists
+        if variable_name not in stat_nc.variables:
+            print(f"Variable {variable_name} not found in {stat_file_path}")
+            return None
+        
+        # Get the data for the specified element
+        # Assuming first dimension is time and second is element
+        try:
+            value = stat_nc.variables[variable_name][0, element_id]
+            count('netcdf_reads')
+            count('netcdf_bytes_read', np.ma.getdata(value).nbytes)
+            return value
+        except Exception as e:
+            print(f"Error getting data: {e}")
+            return None
+
+@timed('read_variables')
+def get_values_for_elements(element_ids, variable_names, stat_file_path="../deltashell-stat_map.nc",
+                            time_index=0, max_gap_ratio=4):
+    """
+    Get the values of several variables for many element IDs in one pass.
+    The statistics file handle comes from the shared dataset pool, and each
+    variable is read with a single call over the sorted, deduplicated element
+    IDs. When the IDs are close together a contiguous slice covering them is
+    read instead, which is much cheaper than a scattered read on chunked files.
     
-    # Check if the variable exists
-    if variable_name not in stat_nc.variables:
-        print(f"Variable {variable_name} not found in {stat_file_path}")
-        stat_nc.close()
-        return None
+    Args:
+        element_ids: Array of element IDs, with -1 (or None) for missing elements
+        variable_names: Names of the variables to extract
+        stat_file_path: Path to the statistics netCDF file
+        time_index: Index of the first (time) dimension to read
+        max_gap_ratio: Read a contiguous slice when it is at most this many
+            times longer than the number of unique element IDs
+        
+    Returns:
+        dict: Variable name to float array of values, one per element ID, with NaN
+        for missing elements and masked values. Variables not found are left out.
+    """
+    return _read_element_values(stat_file_path, variable_names, _element_lookup(element_ids),
+                                time_index, max_gap_ratio)
+
+def _element_lookup(element_ids):
+    """
+    Map element IDs onto their sorted unique values, so each is read once.
     
-    # Get the data for the specified element
-    # Assuming first dimension is time and second is element
-    try:
-        data = stat_nc.variables[variable_name][0, element_id]
-        stat_nc.close()
-        return data
-    except Exception as e:
-        print(f"Error getting data: {e}")
-        stat_nc.close()
-        return None
+    Returns:
+        tuple: (valid, unique_ids, inverse) where values read for unique_ids
+        are spread back over the points with values[valid] = data[inverse]
+    """
+    element_ids = element_id_array(element_ids)
+    valid = element_ids >= 0
+    unique_ids, inverse = np.unique(element_ids[valid], return_inverse=True)
+    return valid, unique_ids, inverse
+
+def _read_element_values(stat_file_path, variable_names, lookup, time_index=0, max_gap_ratio=4):
+    """Read variables for an _element_lookup result (see get_values_for_elements)"""
+    valid, unique_ids, inverse = lookup
+    
+    results = {}
+    with open_dataset(stat_file_path) as stat_nc:
+        for variable_name in variable_names:
+            if variable_name not in stat_nc.variables:
+                print(f"Variable {variable_name} not found in {stat_file_path}")
+                continue
+            
+            values = np.full(len(valid), np.nan)
+            if len(unique_ids) > 0:
+                # Assuming first dimension is time and second is element
+                data = read_element_block(stat_nc.variables[variable_name], time_index,
+                                          unique_ids, max_gap_ratio)
+                values[valid] = data[0, inverse]
+            results[variable_name] = values
+    
+    return results
 
 def get_value_from_coordinates(easting, northing, variable_name, 
                               geom_file_path="../14DayHYD_NoWind_Nash_HD_waqgeom.nc", 
@@ -190,3 +305,43 @@ def get_value_from_coordinates(easting, northing, variable_name,
         
     # Get the value for this element
     return get_value_for_element(element_id, variable_name, stat_file_path)
+
+@timed('reach_average')
+def area_weighted_means(polygon, variable_names, geom_file_path="../14DayHYD_NoWind_Nash_HD_waqgeom.nc",
+                        stat_file_path="../deltashell-stat_map.nc", depth_variable=None, time_index=0):
+    """
+    Average variables over the mesh faces covered by a polygon, weighting each
+    face by the area of it inside the polygon (and optionally by water depth,
+    giving a volume-weighted mean).
+    
+    Args:
+        polygon: shapely Polygon or MultiPolygon, e.g. a buffered transect line
+        variable_names: Names of the face variables to average
+        geom_file_path: Path to the geometry netCDF file
+        stat_file_path: Path to the statistics netCDF file
+        depth_variable: Face variable holding water depth to weight by, or None
+            for a plain area-weighted mean
+        time_index: Index of the first (time) dimension to read
+        
+    Returns:
+        dict: Variable name to weighted mean (NaN where no face has a value),
+        plus 'faces' (number of faces overlapped) and 'area' (m² of mesh inside
+        the polygon)
+    """
+    element_ids, weights = get_mesh_index(geom_file_path).polygon_overlaps(polygon)
+    results = {'faces': len(element_ids), 'area': float(weights.sum())}
+    
+    names = list(variable_names) + ([depth_variable] if depth_variable is not None else [])
+    values = get_values_for_elements(element_ids, names, stat_file_path, time_index) if len(element_ids) else {}
+    if depth_variable is not None:
+        weights = weights * values.get(depth_variable, np.full(len(element_ids), np.nan))
+    
+    for name in variable_names:
+        if name not in values:
+            results[name] = np.nan
+            continue
+        valid = ~np.isnan(values[name]) & ~np.isnan(weights)
+        total = weights[valid].sum()
+        results[name] = float((values[name][valid] * weights[valid]).sum() / total) if total > 0 else np.nan
+    
+    return results
@@ -0,0 +1,168 @@
+import cProfile
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from dataset_pool import DATASET_POOL
+
+
+class Instrumentation:
+    """
+    Per-process record of where a run spends its time.
+    Stages (geometry loading, element lookup, netCDF reads, percentile maths,
+    rendering...) accumulate wall time and call counts, and counters hold
+    bytes read from netCDF and cache hits and misses. Stage times are
+    inclusive, so a stage's time includes any stages nested inside it.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear every stage and counter, e.g. at the start of a run"""
+        with self._lock:
+            self.stages = {}  # name -> {'calls', 'seconds'}
+            self.counters = {}  # name -> total
+            self._pool_start = DATASET_POOL.stats()
+            self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a block of code as one call of a stage.
+
+        Args:
+            name: Stage name, e.g. 'locate'
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            with self._lock:
+                entry = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0})
+                entry['calls'] += 1
+                entry['seconds'] += seconds
+
+    def timed(self, name):
+        """
+        Decorator timing every call of a function as a stage.
+
+        Args:
+            name: Stage name
+        """
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return function(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, amount=1):
+        """
+        Add to a counter, e.g. count('netcdf_bytes_read', data.nbytes).
+        Counters named '<cache>_hits' and '<cache>_misses' are reported as hit rates.
+
+        Args:
+            name: Counter name
+            amount: Amount to add
+        """
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self):
+        """
+        Get everything recorded since the last reset.
+
+        Returns:
+            dict: 'elapsed_seconds', 'stages' (calls and seconds per stage, slowest
+            first), 'counters', 'cache_hit_rates' and 'dataset_pool' (opens, hits and
+            evictions of the shared netCDF handle pool)
+        """
+        with self._lock:
+            stages = dict(sorted(((name, dict(entry)) for name, entry in self.stages.items()),
+                                 key=lambda item: -item[1]['seconds']))
+            counters = dict(self.counters)
+            pool_start = dict(self._pool_start)
+            elapsed = time.perf_counter() - self._start
+
+        hit_rates = {}
+        for name in counters:
+            if name.endswith('_hits'):
+                cache = name[:-len('_hits')]
+                total = counters[name] + counters.get(f'{cache}_misses', 0)
+                hit_rates[cache] = counters[name] / total if total else None
+
+        pool = DATASET_POOL.stats()
+        pool_counts = {key: pool[key] - pool_start.get(key, 0) for key in ('opens', 'hits', 'evictions')}
+        total = pool_counts['opens'] + pool_counts['hits']
+        hit_rates['dataset_pool'] = pool_counts['hits'] / total if total else None
+
+        return {
+            'elapsed_seconds': elapsed,
+            'stages': stages,
+            'counters': counters,
+            'cache_hit_rates': hit_rates,
+            'dataset_pool': pool_counts
+        }
+
+    def save_json(self, path):
+        """
+        Write the summary to a JSON file.
+
+        Args:
+            path: Output file path
+        """
+        with open(path, 'w') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def print_summary(self):
+        """Print stage times and counters in a readable table"""
+        summary = self.summary()
+        print(f"Run time {summary['elapsed_seconds']:.3f} s")
+        for name, entry in summary['stages'].items():
+            print(f"  {name:24s} {entry['seconds']:9.3f} s  {entry['calls']:7d} call(s)")
+        for name, value in summary['counters'].items():
+            print(f"  {name:24s} {value}")
+        for name, rate in summary['cache_hit_rates'].items():
+            if rate is not None:
+                print(f"  {name + ' hit rate':24s} {rate:.1%}")
+
+
+# Instrumentation shared by the whole process
+INSTRUMENTATION = Instrumentation()
+
+
+def stage(name):
+    """Time a block of code as a stage of the shared instrumentation"""
+    return INSTRUMENTATION.stage(name)
+
+
+def timed(name):
+    """Decorator timing a function as a stage of the shared instrumentation"""
+    return INSTRUMENTATION.timed(name)
+
+
+def count(name, amount=1):
+    """Add to a counter of the shared instrumentation"""
+    INSTRUMENTATION.count(name, amount)
+
+
+@contextmanager
+def profile(path):
+    """
+    Run a block of code under cProfile and dump the statistics to a file,
+    which can be read with pstats or viewed with snakeviz.
+
+    Args:
+        path: Output file path, e.g. 'centreline.prof'
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+import numpy as np
+from element_cache import DEFAULT_CACHE_DIR, file_content_hash
+from instrumentation import count
+
+# Bump when the layout of the cached arrays changes, so old caches are rebuilt
+MESH_CACHE_VERSION = 3
+
+
+def _mesh_cache_path(geom_file_path, cache_dir):
+    """Folder holding the cached arrays for a geometry file"""
+    key = hashlib.sha256(os.path.abspath(geom_file_path).encode()).hexdigest()[:32]
+    return os.path.join(cache_dir, "mesh", key)
+
+
+def _file_signature(geom_file_path):
+    """
+    Path and content hash of the geometry file, used to detect changes.
+    The hash is the one the element cache uses, so it is computed once per
+    process for both, and a rewrite or copy that keeps the contents (and
+    so a new modification time) does not invalidate the cache.
+    """
+    return {
+        'version': MESH_CACHE_VERSION,
+        'path': os.path.abspath(geom_file_path),
+        'sha256': file_content_hash(geom_file_path)
+    }
+
+
+def load_mesh_cache(geom_file_path, names, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Open cached mesh arrays as read-only memory maps.
+    Nothing is read up front: pages are loaded on first access and shared
+    through the page cache between every process using the same mesh.
+
+    Args:
+        geom_file_path: Path to the geometry netCDF file
+        names: Names of the arrays to load
+        cache_dir: Folder holding the cache
+
+    Returns:
+        dict: Array name to numpy.memmap, or None if the cache is missing,
+        incomplete or was made from different geometry file contents
+    """
+    path = _mesh_cache_path(geom_file_path, cache_dir)
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get('signature') != _file_signature(geom_file_path):
+            count('mesh_cache_misses')
+            return None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in names}
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"Warning: Ignoring unreadable mesh cache {path}: {e}")
+        count('mesh_cache_misses')
+        return None
+
+    count('mesh_cache_hits')
+    return arrays
+
+
+def save_mesh_cache(geom_file_path, arrays, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Store mesh arrays as flat .npy files for load_mesh_cache.
+    The folder is written under a temporary name and then moved into place,
+    so a reader never sees a half-written cache.
+
+    Args:
+        geom_file_path: Path to the geometry netCDF file
+        arrays: Dict of array name to numpy array
+        cache_dir: Folder holding the cache
+    """
+    path = _mesh_cache_path(geom_file_path, cache_dir)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.makedirs(tmp_path)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({'signature': _file_signature(geom_file_path), 'arrays': sorted(arrays)}, f, indent=2)
+
+        # Replace any stale cache; files still mapped by other processes stay valid on POSIX
+        if os.path.exists(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: Could not write mesh cache {path}: {e}")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def clear_mesh_cache(cache_dir=DEFAULT_CACHE_DIR):
+    """Delete every cached mesh"""
+    shutil.rmtree(os.path.join(cache_dir, "mesh"), ignore_errors=True)
@@ -0,0 +1,140 @@
+import netCDF4
+import numpy as np
+from dataset_pool import open_dataset
+from stat_reader import DEFAULT_MEMORY_BUDGET, iter_stat_chunks
+from helpers import (
+    BOD_BASELINE,
+    BOD_MEAN_VARIABLE,
+    BOD_STDEV_VARIABLE,
+    DIN_BASELINE,
+    DIN_MEAN_VARIABLES,
+    DIN_STDEV_VARIABLES,
+    WFD_CLASSES,
+    classify_wfd_din,
+    lognormal_percentiles
+)
+
+
+def _copy_mesh_variables(src, dst, time_dim, skip, block_size):
+    """
+    Copy the mesh topology and coordinate variables (anything without a time
+    dimension) from the statistics file, so the output is a valid UGRID file.
+    """
+    for name, variable in src.variables.items():
+        if name in skip or (time_dim is not None and time_dim in variable.dimensions):
+            continue
+
+        for dim in variable.dimensions:
+            if dim not in dst.dimensions:
+                size = len(src.dimensions[dim])
+                dst.createDimension(dim, None if src.dimensions[dim].isunlimited() else size)
+
+        attrs = {k: variable.getncattr(k) for k in variable.ncattrs()}
+        fill_value = attrs.pop('_FillValue', None)
+        out = dst.createVariable(name, variable.datatype, variable.dimensions, fill_value=fill_value)
+        out.setncatts(attrs)
+
+        # Copy along the first dimension in blocks to bound memory
+        if variable.ndim == 0:
+            out.assignValue(variable.getValue())
+        else:
+            for start in range(0, variable.shape[0], block_size):
+                block = slice(start, start + block_size)
+                out[block] = variable[block]
+
+
+def evaluate_mesh_compliance(stat_file_path, output_path, percentiles=(10, 90),
+                             memory_budget=DEFAULT_MEMORY_BUDGET, time_index=0):
+    """
+    Evaluate DIN and BOD statistics and WFD compliance for every face of the mesh.
+    The statistics file is streamed in blocks of faces, so memory use is bounded
+    by memory_budget rather than the mesh size. Results are written to a new
+    netCDF file alongside a copy of the mesh topology.
+
+    Args:
+        stat_file_path: Path to the statistics netCDF file
+        output_path: Path of the netCDF file to write
+        percentiles: Log-normal percentiles of DIN and BOD to calculate
+        memory_budget: Approximate maximum bytes of input data held at once
+        time_index: Index of the first (time) dimension to read
+
+    Returns:
+        dict: Number of faces in each WFD class, keyed by class name
+    """
+    required = DIN_MEAN_VARIABLES + DIN_STDEV_VARIABLES + [BOD_MEAN_VARIABLE, BOD_STDEV_VARIABLE]
+    class_counts = {name: 0 for name in WFD_CLASSES}
+
+    with open_dataset(stat_file_path) as src:
+        missing = [var for var in required if var not in src.variables]
+        if missing:
+            raise KeyError(f"Variables {missing} not found in {stat_file_path}")
+
+        template = src.variables[DIN_MEAN_VARIABLES[0]]
+        face_dim = template.dimensions[-1]
+        time_dim = template.dimensions[0] if template.ndim > 1 else None
+        n_faces = template.shape[-1]
+
+        # Keep the UGRID mesh attributes so the results plot on the mesh
+        face_attrs = {k: template.getncattr(k) for k in ('mesh', 'location', 'coordinates')
+                      if k in template.ncattrs()}
+
+        with netCDF4.Dataset(output_path, 'w') as dst:
+            dst.setncatts({k: src.getncattr(k) for k in src.ncattrs()})
+            dst.setncattr('source', f"Mesh compliance evaluated from {stat_file_path}")
+            _copy_mesh_variables(src, dst, time_dim, set(required), max(1, memory_budget // 64))
+            if face_dim not in dst.dimensions:
+                dst.createDimension(face_dim, n_faces)
+
+            def create(name, long_name, units, datatype='f8', fill_value=np.nan):
+                variable = dst.createVariable(name, datatype, (face_dim,), fill_value=fill_value)
+                variable.setncatts(dict(face_attrs, long_name=long_name, units=units))
+                return variable
+
+            outputs = {
+                'mean_din': create('mean_din', 'Mean DIN', 'mg N/l'),
+                'din_std_dev': create('din_std_dev', 'DIN standard deviation', 'mg N/l'),
+                'bod_mean': create('bod_mean', 'Mean BOD', 'mg/l'),
+                'bod_std_dev': create('bod_std_dev', 'BOD standard deviation', 'mg/l'),
+                'din_above_baseline': create('din_above_baseline',
+                                             f'Mean DIN above the {DIN_BASELINE} baseline', '1', 'i1', -1),
+                'bod_above_baseline': create('bod_above_baseline',
+                                             f'Mean BOD above the {BOD_BASELINE} baseline', '1', 'i1', -1),
+            }
+            for p in percentiles:
+                outputs[f'din_percentile_{p}'] = create(f'din_percentile_{p}', f'DIN {p}th percentile', 'mg N/l')
+                outputs[f'bod_percentile_{p}'] = create(f'bod_percentile_{p}', f'BOD {p}th percentile', 'mg/l')
+
+            wfd = create('wfd_class', 'WFD class of mean DIN', '1', 'i1', -1)
+            wfd.flag_values = np.arange(len(WFD_CLASSES), dtype=np.int8)
+            wfd.flag_meanings = ' '.join(name.lower() for name in WFD_CLASSES)
+
+            chunks = iter_stat_chunks(stat_file_path, required, memory_budget,
+                                      times=slice(time_index, time_index + 1))
+            for faces, _, data in chunks:
+                read = {var: values[0] for var, values in data.items()}
+
+                mean_din = read[DIN_MEAN_VARIABLES[0]] + read[DIN_MEAN_VARIABLES[1]]
+                din_std_dev = read[DIN_STDEV_VARIABLES[0]] + read[DIN_STDEV_VARIABLES[1]]
+                bod_mean = read[BOD_MEAN_VARIABLE]
+                bod_std_dev = read[BOD_STDEV_VARIABLE]
+
+                outputs['mean_din'][faces] = mean_din
+                outputs['din_std_dev'][faces] = din_std_dev
+                outputs['bod_mean'][faces] = bod_mean
+                outputs['bod_std_dev'][faces] = bod_std_dev
+                outputs['din_above_baseline'][faces] = np.where(np.isnan(mean_din), -1, mean_din > DIN_BASELINE)
+                outputs['bod_above_baseline'][faces] = np.where(np.isnan(bod_mean), -1, bod_mean > BOD_BASELINE)
+
+                for p, values in lognormal_percentiles(mean_din, din_std_dev, percentiles).items():
+                    outputs[f'din_percentile_{p}'][faces] = values
+                for p, values in lognormal_percentiles(bod_mean, bod_std_dev, percentiles).items():
+                    outputs[f'bod_percentile_{p}'][faces] = values
+
+                classes = classify_wfd_din(mean_din)
+                wfd[faces] = classes
+                counts = np.bincount(classes[classes >= 0], minlength=len(WFD_CLASSES))
+                for name, count in zip(WFD_CLASSES, counts):
+                    class_counts[name] += int(count)
+
+    print(f"Mesh compliance for {n_faces} faces written to {output_path}")
+    return class_counts
@@ -0,0 +1,569 @@
+import os
+import numpy as np
+import shapely
+from shapely.strtree import STRtree
+from dataset_pool import open_dataset
+from instrumentation import count, stage
+from element_cache import DEFAULT_CACHE_DIR
+from mesh_cache import load_mesh_cache, save_mesh_cache
+
+# Mesh indexes already loaded in this process, keyed by geometry file path
+_MESH_INDEXES = {}
+
+# MeshIndex attributes stored in the mesh cache: int32 connectivity, float64
+# coordinates, face boxes and areas, and the edge neighbours used by the walk
+CACHED_ARRAYS = [
+    'node_x', 'node_y', 'elem_node', 'elem_node_count',
+    'elem_xmin', 'elem_xmax', 'elem_ymin', 'elem_ymax', 'tree_elements',
+    '_edge_neighbours', '_face_areas'
+]
+
+
+class MeshIndex:
+    """
+    In-memory index of a waqgeom mesh.
+    Loads node coordinates and element connectivity once so that repeated
+    point-in-element queries do not re-read the geometry file.
+    Element bounding boxes are held in an STR tree, so a query only tests
+    the handful of elements whose boxes cover the point.
+    """
+    def __init__(self, geom_file_path, cache_dir=None):
+        """
+        Load the mesh geometry from a waqgeom netCDF file, or from the
+        memory-mapped mesh cache when it is up to date.
+
+        Args:
+            geom_file_path: Path to the geometry netCDF file
+            cache_dir: Folder of the on-disk mesh cache (see mesh_cache), or None
+                to always read the netCDF file and not write a cache
+        """
+        self.geom_file_path = geom_file_path
+
+        # Edge neighbours and face areas, built on first use
+        self._edge_neighbours = None
+        self._face_areas = None
+
+        cached = load_mesh_cache(geom_file_path, CACHED_ARRAYS, cache_dir) if cache_dir is not None else None
+        if cached is not None:
+            for name, array in cached.items():
+                setattr(self, name, array)
+        else:
+            self._load_geometry(geom_file_path)
+            if cache_dir is not None:
+                save_mesh_cache(geom_file_path, self._cache_arrays(), cache_dir)
+
+        # Bounding-box tree, built on first use (see tree)
+        self._tree = None
+
+    def _load_geometry(self, geom_file_path):
+        """Read the mesh from the geometry file and derive the lookup arrays"""
+        with open_dataset(geom_file_path) as nc:
+            # Node coordinates as plain float arrays
+            self.node_x = np.ma.filled(nc.variables["NetNode_x"][:], np.nan).astype(np.float64)
+            self.node_y = np.ma.filled(nc.variables["NetNode_y"][:], np.nan).astype(np.float64)
+
+            # NetElemNode is shape (nElem, nNodesPerElem), 1-based with fill values for padding
+            elem_node = nc.variables["NetElemNode"][:] - 1  # Convert to 0-based
+        count('netcdf_reads', 3)
+        count('netcdf_bytes_read', self.node_x.nbytes + self.node_y.nbytes + np.ma.getdata(elem_node).nbytes)
+
+        # Padding becomes -1
+        self.elem_node = np.ma.filled(elem_node, -1).astype(np.int32)
+        self.elem_node[self.elem_node < 0] = -1
+
+        # Number of valid nodes per element
+        valid = self.elem_node >= 0
+        self.elem_node_count = valid.sum(axis=1).astype(np.int32)
+
+        # Per-element bounding boxes (padding ignored)
+        safe_ids = np.where(valid, self.elem_node, 0)
+        elem_x = np.where(valid, self.node_x[safe_ids], np.nan)
+        elem_y = np.where(valid, self.node_y[safe_ids], np.nan)
+        with np.errstate(invalid='ignore'):
+            self.elem_xmin = np.nanmin(elem_x, axis=1)
+            self.elem_xmax = np.nanmax(elem_x, axis=1)
+            self.elem_ymin = np.nanmin(elem_y, axis=1)
+            self.elem_ymax = np.nanmax(elem_y, axis=1)
+
+        # Elements with at least 3 nodes, which go in the bounding-box tree
+        self.tree_elements = np.nonzero(self.elem_node_count >= 3)[0].astype(np.int32)
+
+    def _cache_arrays(self):
+        """Every array kept in the mesh cache, building the lazy ones first"""
+        self._build_edge_neighbours()
+        self._build_face_areas()
+        return {name: getattr(self, name) for name in CACHED_ARRAYS}
+
+    @property
+    def tree(self):
+        """
+        STR tree over the bounding boxes of every element with at least 3 nodes.
+        Shapely trees cannot be memory-mapped, so this is rebuilt from the cached
+        boxes rather than stored, and only when a query first needs it. Every
+        point lookup and polygon query does, including the seed of each
+        locate_points_walk call; face areas and edge neighbours do not.
+        """
+        if self._tree is None:
+            self._tree = STRtree(shapely.box(
+                self.elem_xmin[self.tree_elements], self.elem_ymin[self.tree_elements],
+                self.elem_xmax[self.tree_elements], self.elem_ymax[self.tree_elements]
+            ))
+        return self._tree
+
+    def _build_edge_neighbours(self):
+        """Derive edge_neighbours from the edges shared between elements"""
+        n_elem, max_nodes = self.elem_node.shape
+        cols = np.arange(max_nodes)[None, :]
+        counts = self.elem_node_count[:, None]
+        edge_valid = (cols < counts) & (counts >= 3)
+        next_cols = np.where(cols + 1 < counts, cols + 1, 0)
+        start_nodes = self.elem_node
+        end_nodes = np.take_along_axis(self.elem_node, next_cols, axis=1)
+
+        # Undirected edge key, identical for both elements sharing an edge
+        n_nodes = np.int64(len(self.node_x))
+        keys = np.minimum(start_nodes, end_nodes) * n_nodes + np.maximum(start_nodes, end_nodes)
+        flat = np.nonzero(edge_valid.ravel())[0]
+        order = flat[np.argsort(keys.ravel()[flat], kind='stable')]
+        sorted_keys = keys.ravel()[order]
+
+        # Consecutive equal keys are the two sides of an interior edge
+        shared = np.nonzero(sorted_keys[1:] == sorted_keys[:-1])[0]
+        side_a, side_b = order[shared], order[shared + 1]
+
+        edge_neighbours = np.full(n_elem * max_nodes, -1, dtype=np.int32)
+        edge_neighbours[side_a] = side_b // max_nodes
+        edge_neighbours[side_b] = side_a // max_nodes
+        self._edge_neighbours = edge_neighbours.reshape(n_elem, max_nodes)
+
+    @property
+    def edge_neighbours(self):
+        """
+        Element across each edge, shape (elements, max nodes).
+        Column i is the neighbour across the edge from node i to the next node,
+        -1 for boundary edges and padding.
+        """
+        if self._edge_neighbours is None:
+            self._build_edge_neighbours()
+        return self._edge_neighbours
+
+    def _closed_face_coordinates(self, elem_idx=None):
+        """
+        Node coordinates of faces as fixed-width rings, shape (faces, max nodes).
+        Padding repeats the first node, which adds only zero-length edges.
+        """
+        elem_node = self.elem_node if elem_idx is None else self.elem_node[elem_idx]
+        padded = np.where(elem_node >= 0, elem_node, np.maximum(elem_node[:, :1], 0))
+        return self.node_x[padded], self.node_y[padded]
+
+    def _build_face_areas(self):
+        """
+        Calculate every face's area with the shoelace formula, vectorised over
+        the padded connectivity. Coordinates are taken relative to each face's
+        first node to keep precision at national grid offsets.
+        """
+        x, y = self._closed_face_coordinates()
+        x, y = x - x[:, :1], y - y[:, :1]
+        signed_area = (x * np.roll(y, -1, axis=1) - np.roll(x, -1, axis=1) * y).sum(axis=1) / 2
+        self._face_areas = np.where(self.elem_node_count >= 3, np.abs(signed_area), 0.0)
+
+    @property
+    def face_areas(self):
+        """Plan area of every face (m²), 0 for faces with fewer than 3 nodes"""
+        if self._face_areas is None:
+            self._build_face_areas()
+        return self._face_areas
+
+    def element_polygons(self, elem_idx):
+        """
+        Build shapely polygons for many elements in one vectorised call.
+
+        Args:
+            elem_idx: Array of 0-based element IDs, each with at least 3 nodes
+
+        Returns:
+            numpy.ndarray: Polygon per element
+        """
+        x, y = self._closed_face_coordinates(np.asarray(elem_idx, dtype=np.int64))
+        return shapely.polygons(np.stack((x, y), axis=-1))
+
+    def polygon_overlaps(self, polygon, tiles=16):
+        """
+        Find the faces overlapping a polygon and the area of each overlap.
+        Faces lying wholly inside the polygon use their precomputed area, so
+        only faces on its boundary need an exact shapely intersection.
+
+        Args:
+            polygon: shapely Polygon or MultiPolygon, e.g. a buffered transect line
+            tiles: Number of tiles along each side of the polygon's bounds used
+                to gather candidate faces
+
+        Returns:
+            tuple: (element_ids, areas) arrays of 0-based element IDs, in ascending
+            order, and the area of each face inside the polygon (m²)
+        """
+        # Query the tree with the polygon cut into tiles, so a long thin reach does
+        # not pull in every face within its overall bounding box
+        xmin, ymin, xmax, ymax = polygon.bounds
+        xs = np.linspace(xmin, xmax, tiles + 1)
+        ys = np.linspace(ymin, ymax, tiles + 1)
+        x0, y0 = np.meshgrid(xs[:-1], ys[:-1])
+        x1, y1 = np.meshgrid(xs[1:], ys[1:])
+        pieces = shapely.intersection(shapely.box(x0.ravel(), y0.ravel(), x1.ravel(), y1.ravel()), polygon)
+        pieces = pieces[~shapely.is_empty(pieces)]
+        candidates = np.unique(self.tree_elements[self.tree.query(pieces)[1]])
+        if len(candidates) == 0:
+            return candidates, np.zeros(0)
+
+        faces = self.element_polygons(candidates)
+        shapely.prepare(polygon)
+        inside = shapely.contains_properly(polygon, faces)
+        boundary = ~inside & shapely.intersects(polygon, faces)
+
+        areas = np.zeros(len(candidates))
+        areas[inside] = self.face_areas[candidates[inside]]
+        areas[boundary] = shapely.area(shapely.intersection(faces[boundary], polygon))
+
+        keep = areas > 0
+        return candidates[keep], areas[keep]
+
+    @property
+    def n_elements(self):
+        """Number of elements in the mesh"""
+        return len(self.elem_node)
+
+    def find_element(self, easting, northing):
+        """
+        Find the mesh element ID containing the given coordinates.
+
+        Args:
+            easting: X coordinate (easting)
+            northing: Y coordinate (northing)
+
+        Returns:
+            int: Element ID if found, None if not found
+        """
+        elem_idx = self.locate_points([easting], [northing])[0]
+        return None if elem_idx < 0 else int(elem_idx)
+
+    def locate_points(self, eastings, northings, batch_size=100000):
+        """
+        Find the mesh element containing each of many points in one call.
+        Candidate elements come from the bounding-box tree and are then tested
+        with a vectorised crossing-number test over the padded connectivity.
+        Where several elements contain a point the lowest element ID is used.
+
+        Args:
+            eastings: Array of X coordinates
+            northings: Array of Y coordinates
+            batch_size: Number of points to test at once, to bound memory use
+
+        Returns:
+            numpy.ndarray: Element ID for each point, -1 where no element was found
+        """
+        eastings = np.asarray(eastings, dtype=np.float64)
+        northings = np.asarray(northings, dtype=np.float64)
+        if eastings.shape != northings.shape:
+            raise ValueError("Eastings and northings lists must have the same length")
+
+        result = np.full(len(eastings), -1, dtype=np.int64)
+        for start in range(0, len(eastings), batch_size):
+            stop = start + batch_size
+            result[start:stop] = self._locate_batch(eastings[start:stop], northings[start:stop])
+        return result
+
+    def locate_points_walk(self, eastings, northings, max_steps=100):
+        """
+        Find the mesh element containing each of an ordered sequence of points.
+        Consecutive points on a transect usually fall in the same or an adjacent
+        element, so each search walks across face neighbours starting from the
+        previous point's element, making the cost per point nearly constant.
+        The global index is used for the first point, after a miss, and
+        whenever a walk leaves the mesh or takes more than max_steps.
+
+        Args:
+            eastings: Array of X coordinates, in order along the transect
+            northings: Array of Y coordinates, in order along the transect
+            max_steps: Longest walk before falling back to the global index
+
+        Returns:
+            numpy.ndarray: Element ID for each point, -1 where no element was found
+        """
+        eastings = np.asarray(eastings, dtype=np.float64)
+        northings = np.asarray(northings, dtype=np.float64)
+        if eastings.shape != northings.shape:
+            raise ValueError("Eastings and northings lists must have the same length")
+
+        edge_neighbours = self.edge_neighbours
+        result = np.full(len(eastings), -1, dtype=np.int64)
+        current = -1
+
+        for i in range(len(eastings)):
+            px, py = eastings[i], northings[i]
+            found = self._walk(current, px, py, edge_neighbours, max_steps) if current >= 0 else -1
+            if found < 0:
+                found = self.locate_points(eastings[i:i + 1], northings[i:i + 1])[0]
+            result[i] = found
+            current = found
+
+        return result
+
+    def _walk(self, elem_idx, px, py, edge_neighbours, max_steps):
+        """
+        Walk from an element towards a point, crossing the edge the point lies
+        furthest beyond each time. Works on plain Python floats, as NumPy call
+        overhead would dominate for a single small polygon.
+
+        Returns:
+            int: The element containing the point, or -1 if the walk failed
+        """
+        px, py = float(px), float(py)
+        for _ in range(max_steps):
+            nodes = self.elem_node[elem_idx, :self.elem_node_count[elem_idx]]
+            xs = self.node_x[nodes].tolist()
+            ys = self.node_y[nodes].tolist()
+            n = len(xs)
+
+            # Winding of the element, so "inside" is the same side of every edge
+            area = sum(xs[j] * ys[(j + 1) % n] - xs[(j + 1) % n] * ys[j] for j in range(n))
+            orientation = 1.0 if area >= 0 else -1.0
+
+            # Find the edge the point lies furthest outside of, if any
+            worst, exit_col = 0.0, -1
+            for j in range(n):
+                k = (j + 1) % n
+                side = ((xs[k] - xs[j]) * (py - ys[j]) - (ys[k] - ys[j]) * (px - xs[j])) * orientation
+                if side < worst:
+                    worst, exit_col = side, j
+
+            if exit_col < 0:
+                # Inside (or on the boundary of) this convex element; confirm
+                # with the same crossing-number test as the global index
+                crossings = 0
+                for j in range(n):
+                    k = (j + 1) % n
+                    if (ys[j] > py) != (ys[k] > py) and px < xs[j] + (py - ys[j]) * (xs[k] - xs[j]) / (ys[k] - ys[j]):
+                        crossings += 1
+                return int(elem_idx) if crossings % 2 == 1 else -1
+
+            elem_idx = edge_neighbours[elem_idx, exit_col]
+            if elem_idx < 0:
+                return -1  # Walked off the mesh boundary
+
+        return -1
+
+    def _locate_batch(self, px, py):
+        """Locate one batch of points, see locate_points"""
+        result = np.full(len(px), -1, dtype=np.int64)
+        if len(px) == 0:
+            return result
+
+        # (point, element) pairs whose bounding boxes overlap
+        point_idx, tree_idx = self.tree.query(shapely.points(px, py))
+        if len(point_idx) == 0:
+            return result
+        elem_idx = self.tree_elements[tree_idx]
+
+        inside = self._points_in_elements(px[point_idx], py[point_idx], elem_idx)
+        point_idx, elem_idx = point_idx[inside], elem_idx[inside]
+
+        # Keep the lowest containing element for each point
+        order = np.lexsort((elem_idx, point_idx))
+        point_idx, elem_idx = point_idx[order], elem_idx[order]
+        first = np.unique(point_idx, return_index=True)[1]
+        result[point_idx[first]] = elem_idx[first]
+        return result
+
+    def _element_edges(self, elem_idx):
+        """
+        Get the edges of many elements from the padded connectivity.
+
+        Args:
+            elem_idx: Array of element IDs
+
+        Returns:
+            tuple: (x1, y1, x2, y2, edge_valid) arrays of shape (elements, max nodes),
+            where each edge runs from a valid node to the next one, wrapping at the
+            last, and edge_valid is False for padding
+        """
+        nodes = self.elem_node[elem_idx]
+        counts = self.elem_node_count[elem_idx][:, None]
+
+        cols = np.arange(nodes.shape[1])[None, :]
+        edge_valid = cols < counts
+        next_cols = np.where(cols + 1 < counts, cols + 1, 0)
+        start_nodes = np.where(edge_valid, nodes, 0)
+        end_nodes = np.where(edge_valid, np.take_along_axis(nodes, next_cols, axis=1), 0)
+
+        return (self.node_x[start_nodes], self.node_y[start_nodes],
+                self.node_x[end_nodes], self.node_y[end_nodes], edge_valid)
+
+    def _points_in_elements(self, px, py, elem_idx):
+        """
+        Crossing-number test of points against elements, pair by pair.
+
+        Args:
+            px: X coordinate of each point
+            py: Y coordinate of each point
+            elem_idx: Element to test each point against
+
+        Returns:
+            numpy.ndarray: Boolean array, True where the point is inside the element
+        """
+        x1, y1, x2, y2, edge_valid = self._element_edges(elem_idx)
+        px, py = px[:, None], py[:, None]
+
+        # Count edges crossed by a ray running in +x from the point
+        straddles = (y1 > py) != (y2 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x1 + (py - y1) * (x2 - x1) / (y2 - y1)
+        crossings = edge_valid & straddles & (px < x_cross)
+        return (crossings.sum(axis=1) % 2) == 1
+
+
+    def trace_polyline(self, eastings, northings):
+        """
+        Find every mesh element crossed by a polyline and where it is crossed.
+        Candidate elements are those whose bounding boxes the polyline actually
+        intersects, found for all segments in one tree query. Each segment is
+        then clipped against its candidates with a vectorised Cyrus-Beck test,
+        which assumes convex elements as D-Flow FM meshes use.
+
+        Args:
+            eastings: X coordinates of the polyline vertices, in order
+            northings: Y coordinates of the polyline vertices, in order
+
+        Returns:
+            dict: Arrays ordered along the polyline, one entry per crossing:
+            'element_id', 'start_chainage' and 'end_chainage' (distance along
+            the polyline where it enters and leaves the element), and
+            'chainage', 'easting' and 'northing' of the crossing midpoint
+        """
+        return self.trace_polylines([(eastings, northings)])[0]
+
+    def trace_polylines(self, polylines):
+        """
+        Trace many polylines at once, as trace_polyline does for one. The
+        segments of every polyline go through one tree query and one clipping
+        pass, so a layer of transects costs little more than a single one.
+
+        Args:
+            polylines: Sequence of (eastings, northings) vertex coordinates
+
+        Returns:
+            list: One dict of crossings per polyline, in order (see trace_polyline)
+        """
+        xs = [np.asarray(eastings, dtype=np.float64) for eastings, _ in polylines]
+        ys = [np.asarray(northings, dtype=np.float64) for _, northings in polylines]
+        if any(x.shape != y.shape for x, y in zip(xs, ys)):
+            raise ValueError("Eastings and northings lists must have the same length")
+
+        # Chainage of each vertex along its own polyline
+        vertex_chainages = [np.concatenate(([0.0], np.cumsum(np.hypot(np.diff(x), np.diff(y)))))
+                            for x, y in zip(xs, ys)]
+
+        # Segments of every polyline, one after another
+        n_segments = [max(len(x) - 1, 0) for x in xs]
+        seg_line = np.repeat(np.arange(len(xs)), n_segments)
+        seg_x0 = np.concatenate([x[:-1] for x in xs] + [np.zeros(0)])
+        seg_y0 = np.concatenate([y[:-1] for y in ys] + [np.zeros(0)])
+        seg_x1 = np.concatenate([x[1:] for x in xs] + [np.zeros(0)])
+        seg_y1 = np.concatenate([y[1:] for y in ys] + [np.zeros(0)])
+        seg_start = np.concatenate([chainage[:-1] for chainage in vertex_chainages] + [np.zeros(0)])
+        seg_dx, seg_dy = seg_x1 - seg_x0, seg_y1 - seg_y0
+        seg_length = np.hypot(seg_dx, seg_dy)
+
+        # (segment, element) pairs where the segment crosses the element's box
+        seg_idx, elem_idx = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        if len(seg_x0):
+            segments = shapely.linestrings(np.stack([
+                np.column_stack([seg_x0, seg_y0]), np.column_stack([seg_x1, seg_y1])
+            ], axis=1))
+            seg_idx, tree_idx = self.tree.query(segments, predicate='intersects')
+            elem_idx = self.tree_elements[tree_idx]
+
+        if len(seg_idx):
+            # Orient edge normals outwards whatever the element's winding
+            x1, y1, x2, y2, edge_valid = self._element_edges(elem_idx)
+            area = np.sum(np.where(edge_valid, x1 * y2 - x2 * y1, 0.0), axis=1)
+            orientation = np.where(area >= 0, 1.0, -1.0)[:, None]
+            normal_x = (y2 - y1) * orientation
+            normal_y = -(x2 - x1) * orientation
+
+            # Clip P(t) = P0 + t * D against every edge's half-plane
+            p0x, p0y = seg_x0[seg_idx][:, None], seg_y0[seg_idx][:, None]
+            numerator = normal_x * (p0x - x1) + normal_y * (p0y - y1)
+            denominator = normal_x * seg_dx[seg_idx][:, None] + normal_y * seg_dy[seg_idx][:, None]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t = -numerator / denominator
+            entering = edge_valid & (denominator < 0)
+            leaving = edge_valid & (denominator > 0)
+            outside = np.any(edge_valid & (denominator == 0) & (numerator > 0), axis=1)
+
+            t_enter = np.max(np.where(entering, t, 0.0), axis=1, initial=0.0)
+            t_exit = np.min(np.where(leaving, t, 1.0), axis=1, initial=1.0)
+            crossed = ~outside & (t_enter < t_exit)
+            seg_idx, elem_idx = seg_idx[crossed], elem_idx[crossed]
+            t_enter, t_exit = t_enter[crossed], t_exit[crossed]
+        else:
+            t_enter = t_exit = np.zeros(0)
+
+        line = seg_line[seg_idx]
+        start = seg_start[seg_idx] + t_enter * seg_length[seg_idx]
+        end = seg_start[seg_idx] + t_exit * seg_length[seg_idx]
+
+        # Order along each polyline, then merge a crossing split over a vertex
+        order = np.lexsort((elem_idx, start, line))
+        line, elem_idx, start, end = line[order], elem_idx[order], start[order], end[order]
+        new_run = np.ones(len(elem_idx), dtype=bool)
+        new_run[1:] = (line[1:] != line[:-1]) | (elem_idx[1:] != elem_idx[:-1]) | ~np.isclose(start[1:], end[:-1])
+        line, elem_idx, start = line[new_run], elem_idx[new_run], start[new_run]
+        end = np.maximum.reduceat(end, np.nonzero(new_run)[0]) if len(end) else end
+
+        # Split per polyline
+        bounds = np.searchsorted(line, np.arange(len(xs) + 1))
+        traces = []
+        for i, (x, y, vertex_chainage) in enumerate(zip(xs, ys, vertex_chainages)):
+            run = slice(bounds[i], bounds[i + 1])
+            chainage = (start[run] + end[run]) / 2
+            traces.append({
+                'element_id': elem_idx[run].astype(np.int64),
+                'start_chainage': start[run],
+                'end_chainage': end[run],
+                'chainage': chainage,
+                'easting': np.interp(chainage, vertex_chainage, x) if len(x) else chainage,
+                'northing': np.interp(chainage, vertex_chainage, y) if len(y) else chainage
+            })
+        return traces
+
+def get_mesh_index(geom_file_path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Get the shared MeshIndex for a geometry file, loading it on first use.
+    The index is reloaded if the file has been modified since it was loaded.
+
+    Args:
+        geom_file_path: Path to the geometry netCDF file
+        cache_dir: Folder of the on-disk mesh cache, or None to read the netCDF file
+
+    Returns:
+        MeshIndex: The index for the geometry file
+    """
+    key = os.path.abspath(geom_file_path)
+    stat = os.stat(key)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _MESH_INDEXES.get(key)
+    if cached is not None and cached[0] == signature:
+        count('mesh_index_hits')
+        return cached[1]
+
+    count('mesh_index_misses')
+    with stage('mesh_load'):
+        mesh_index = MeshIndex(geom_file_path, cache_dir)
+    _MESH_INDEXES[key] = (signature, mesh_index)
+    return mesh_index
+
+
+def clear_mesh_indexes():
+    """Drop every loaded MeshIndex, so the next get_mesh_index call reloads from disk"""
+    _MESH_INDEXES.clear()
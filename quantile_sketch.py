@@ -0,0 +1,211 @@
+import numpy as np
+
+# Values of each series kept exactly before switching to P² estimates. P² started
+# from only five values is visibly biased on short series (around 5-15 values).
+DEFAULT_EXACT_COUNT = 50
+
+
+class P2Quantile:
+    """
+    Streaming estimate of one quantile for many independent series at once,
+    using the P² algorithm (Jain & Chlamtac, 1985).
+    The first exact_count values of each series are kept, and the quantile
+    is exact up to then. After that each series keeps five markers, started
+    from the exact order statistics, so memory is O(series) however many
+    values are added.
+    """
+    def __init__(self, percentile, n_series, exact_count=DEFAULT_EXACT_COUNT, buffer=None):
+        """
+        Initialize empty sketches.
+
+        Args:
+            percentile: The percentile to estimate (e.g., 90 for 90th percentile)
+            n_series: Number of independent series (e.g. transect points)
+            exact_count: Number of values per series kept exactly, at least 5
+            buffer: NaN-filled array of shape (exact_count, n_series) to keep them in,
+                which sketches given the same values can share; a new one if None
+        """
+        if exact_count < 5:
+            raise ValueError("exact_count must be at least 5")
+        self.percentile = percentile
+        self.p = percentile / 100.0
+        self.exact_count = exact_count
+        self.count = np.zeros(n_series, dtype=np.int64)
+        self.buffer = np.full((exact_count, n_series), np.nan) if buffer is None else buffer
+        self.heights = np.full((5, n_series), np.nan)
+        self.positions = np.zeros((5, n_series))
+        self.desired = np.zeros((5, n_series))
+        self.increments = np.array([0.0, self.p / 2, self.p, (1 + self.p) / 2, 1.0])
+
+    def update(self, values):
+        """
+        Add one value to every series. NaN values are skipped.
+
+        Args:
+            values: Array with one value per series
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+
+        # Series still filling their exact values
+        filling = np.nonzero(valid & (self.count < self.exact_count))[0]
+        if len(filling):
+            self.buffer[self.count[filling], filling] = values[filling]
+            self.count[filling] += 1
+            ready = filling[self.count[filling] == self.exact_count]
+            if len(ready):
+                self._start_markers(ready)
+
+        # Series with all five markers in place
+        active = np.nonzero(valid & (self.count >= self.exact_count))[0]
+        active = np.setdiff1d(active, filling, assume_unique=True)
+        if len(active):
+            self._update_markers(active, values[active])
+            self.count[active] += 1
+
+    def _start_markers(self, idx):
+        """Place the markers of the series in idx on their exact order statistics"""
+        n = self.exact_count
+        desired = 1 + (n - 1) * self.increments
+        positions = np.round(desired)
+        # Keep the markers distinct, as the updates need
+        for i in (1, 2, 3):
+            positions[i] = min(max(positions[i], positions[i - 1] + 1), n - 4 + i)
+
+        ordered = np.sort(self.buffer[:, idx], axis=0)
+        self.heights[:, idx] = ordered[positions.astype(np.int64) - 1]
+        self.positions[:, idx] = positions[:, None]
+        self.desired[:, idx] = desired[:, None]
+
+    def _update_markers(self, idx, x):
+        """P² marker update for the series in idx with new values x"""
+        q = self.heights[:, idx]
+        n = self.positions[:, idx]
+        desired = self.desired[:, idx]
+
+        # Cell the value falls in, extending the extreme markers if needed
+        k = (x >= q[1]).astype(np.int64) + (x >= q[2]) + (x >= q[3])
+        q[0] = np.minimum(q[0], x)
+        q[4] = np.maximum(q[4], x)
+        n += np.arange(5)[:, None] > k[None, :]
+        desired += self.increments[:, None]
+
+        # Adjust the three middle markers in turn
+        for i in (1, 2, 3):
+            d = desired[i] - n[i]
+            adjust = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not adjust.any():
+                continue
+            step = np.sign(d)
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                parabolic = q[i] + step / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+                )
+                neighbour_q = np.where(step > 0, q[i + 1], q[i - 1])
+                neighbour_n = np.where(step > 0, n[i + 1], n[i - 1])
+                linear = q[i] + step * (neighbour_q - q[i]) / (neighbour_n - n[i])
+
+            new_height = np.where((q[i - 1] < parabolic) & (parabolic < q[i + 1]), parabolic, linear)
+            q[i] = np.where(adjust, new_height, q[i])
+            n[i] = np.where(adjust, n[i] + step, n[i])
+
+        self.heights[:, idx] = q
+        self.positions[:, idx] = n
+        self.desired[:, idx] = desired
+
+    def result(self):
+        """
+        Get the current quantile estimates.
+
+        Returns:
+            numpy.ndarray: Estimate per series, exact while a series has at most
+            exact_count values, NaN for series without any
+        """
+        estimate = self.heights[2].copy()
+
+        # Exact percentile for series still within their exact values (the rest of the buffer is NaN)
+        idx = np.nonzero((self.count > 0) & (self.count <= self.exact_count))[0]
+        if len(idx):
+            estimate[idx] = np.nanpercentile(self.buffer[:, idx], self.percentile, axis=0)
+        estimate[self.count == 0] = np.nan
+        return estimate
+
+
+class StreamingTimeSeriesStatistics:
+    """
+    Streaming percentiles and threshold exceedance for many time series.
+    Produces the same keys as stat_reader.time_series_statistics, but memory
+    stays O(series) regardless of the length of the time series.
+    """
+    def __init__(self, n_series, percentiles=(10, 50, 90), threshold=None, exact_count=DEFAULT_EXACT_COUNT):
+        """
+        Initialize empty statistics.
+
+        Args:
+            n_series: Number of independent series (e.g. transect points)
+            percentiles: Percentiles to estimate
+            threshold: Concentration to test exceedance against, or None to skip
+            exact_count: Number of values per series kept exactly (see P2Quantile)
+        """
+        self.n_series = n_series
+        # Every sketch sees the same values, so they share one buffer of exact values
+        buffer = np.full((exact_count, n_series), np.nan)
+        self.sketches = [P2Quantile(p, n_series, exact_count, buffer) for p in percentiles]
+        self.threshold = threshold
+        self.valid_steps = np.zeros(n_series, dtype=np.int64)
+        self.exceedance_steps = np.zeros(n_series, dtype=np.int64)
+        self.current_run = np.zeros(n_series, dtype=np.int64)
+        self.longest_run = np.zeros(n_series, dtype=np.int64)
+
+    def update(self, block, columns=None):
+        """
+        Add consecutive time steps to the statistics.
+
+        Args:
+            block: Array of shape (time, series), or (time, len(columns)) if
+                columns is given. NaN values are skipped.
+            columns: Series the block's columns belong to, all series if None
+        """
+        block = np.atleast_2d(np.asarray(block, dtype=np.float64))
+        touched = np.ones(self.n_series, dtype=bool)
+        if columns is not None:
+            # Series outside the block keep their current exceedance run
+            touched = np.zeros(self.n_series, dtype=bool)
+            touched[columns] = True
+
+        for row in block:
+            if columns is not None:
+                values = np.full(self.n_series, np.nan)
+                values[columns] = row
+            else:
+                values = row
+
+            for sketch in self.sketches:
+                sketch.update(values)
+
+            self.valid_steps += ~np.isnan(values)
+            if self.threshold is not None:
+                above = values > self.threshold
+                self.exceedance_steps += above
+                self.current_run = np.where(above, self.current_run + 1,
+                                            np.where(touched, 0, self.current_run))
+                np.maximum(self.longest_run, self.current_run, out=self.longest_run)
+
+    def result(self):
+        """
+        Get the current statistics.
+
+        Returns:
+            dict: 'percentile_<p>' arrays per series, and if a threshold was given
+            'exceedance_steps', 'exceedance_fraction' and 'longest_exceedance'
+        """
+        results = {f'percentile_{sketch.percentile}': sketch.result() for sketch in self.sketches}
+        if self.threshold is not None:
+            results['exceedance_steps'] = self.exceedance_steps.copy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                results['exceedance_fraction'] = np.where(
+                    self.valid_steps > 0, self.exceedance_steps / self.valid_steps, np.nan)
+            results['longest_exceedance'] = self.longest_run.copy()
+        return results
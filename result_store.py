@@ -0,0 +1,164 @@
+import os
+import pandas as pd
+
+# Columns used to partition the dataset on disk
+PARTITION_COLUMNS = ['scenario', 'transect']
+
+
+def _require_pyarrow():
+    """
+    Import pyarrow, which is only needed for the result store.
+
+    Returns:
+        tuple: (pyarrow, pyarrow.dataset) modules
+    """
+    try:
+        import pyarrow
+        import pyarrow.dataset
+    except ImportError as e:
+        raise ImportError("The result store requires pyarrow (pip install pyarrow)") from e
+    return pyarrow, pyarrow.dataset
+
+
+class ResultStore:
+    """
+    Parquet dataset of processed transect DataFrames, partitioned by scenario and
+    transect (e.g. results/scenario=baseline/transect=centreline/part-0.parquet).
+    Saved transects can be reloaded and re-plotted without touching the netCDF
+    files, and queried across runs with filters that are pushed down to Parquet.
+    """
+    def __init__(self, root):
+        """
+        Initialize the store.
+
+        Args:
+            root: Folder holding the Parquet dataset, created on first save
+        """
+        _require_pyarrow()
+        self.root = root
+
+    def save(self, transect_df, scenario, transect, point_ids=None):
+        """
+        Save a transect DataFrame, replacing any earlier result for the same
+        scenario and transect.
+
+        Args:
+            transect_df: DataFrame from a RiverTransect, e.g. after calculate_statistics
+            scenario: Scenario name, e.g. the statistics file it was read from
+            transect: Transect name, e.g. "cross_section_1"
+            point_ids: Original point IDs (e.g. the CSV 'id' column), kept for re-plotting
+        """
+        pa, ds = _require_pyarrow()
+
+        df = transect_df.reset_index(drop=True)
+        df.insert(0, 'point', range(len(df)))
+        if point_ids is not None:
+            df.insert(1, 'point_id', list(point_ids))
+        # Element IDs are None where a point is outside the mesh
+        if 'element_id' in df.columns:
+            df['element_id'] = df['element_id'].astype('Int64')
+        df['scenario'] = str(scenario)
+        df['transect'] = str(transect)
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        partitioning = ds.partitioning(
+            pa.schema([(name, pa.string()) for name in PARTITION_COLUMNS]), flavor='hive'
+        )
+        ds.write_dataset(table, self.root, format='parquet', partitioning=partitioning,
+                         existing_data_behavior='delete_matching',
+                         basename_template='part-{i}.parquet')
+
+    def _dataset(self):
+        """Open the dataset with hive partitioning"""
+        _, ds = _require_pyarrow()
+        return ds.dataset(self.root, format='parquet', partitioning='hive')
+
+    def query(self, columns=None, filter=None, scenario=None, transect=None):
+        """
+        Read rows across every saved run.
+        Partition filters skip whole folders, and other filters are checked
+        against Parquet row group statistics before any data is read.
+
+        Args:
+            columns: Columns to read, all if None
+            filter: pyarrow.dataset expression, e.g. pyarrow.dataset.field('mean_din') > 3
+            scenario: Only read this scenario (or list of scenarios)
+            transect: Only read this transect (or list of transects)
+
+        Returns:
+            pandas.DataFrame: Matching rows, including 'scenario' and 'transect' columns
+        """
+        _, ds = _require_pyarrow()
+
+        for name, value in (('scenario', scenario), ('transect', transect)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            expression = ds.field(name).isin(values)
+            filter = expression if filter is None else filter & expression
+
+        table = self._dataset().to_table(columns=columns, filter=filter)
+        return table.to_pandas()
+
+    def load(self, scenario, transect):
+        """
+        Reload one saved transect.
+
+        Args:
+            scenario: Scenario name it was saved under
+            transect: Transect name it was saved under
+
+        Returns:
+            tuple: (transect_df, point_ids) with transect_df in the layout of
+            RiverTransect.df and point_ids None if they were not saved
+        """
+        df = self.query(scenario=scenario, transect=transect)
+        if df.empty:
+            raise KeyError(f"No saved result for scenario {scenario!r}, transect {transect!r}")
+
+        df = df.sort_values('point').reset_index(drop=True)
+        point_ids = df['point_id'] if 'point_id' in df.columns else None
+        df = df.drop(columns=[c for c in ['point', 'point_id'] + PARTITION_COLUMNS if c in df.columns])
+
+        # Back to None for points outside the mesh, as RiverTransect stores them
+        if 'element_id' in df.columns:
+            if df['element_id'].notna().all():
+                df['element_id'] = df['element_id'].astype('int64')
+            else:
+                df['element_id'] = df['element_id'].astype(object).where(df['element_id'].notna(), None)
+        return df, point_ids
+
+    def list_results(self):
+        """
+        List the saved transects.
+
+        Returns:
+            pandas.DataFrame: One row per saved (scenario, transect)
+        """
+        if not os.path.isdir(self.root):
+            return pd.DataFrame(columns=PARTITION_COLUMNS)
+        df = self.query(columns=PARTITION_COLUMNS)
+        return df.drop_duplicates().sort_values(PARTITION_COLUMNS).reset_index(drop=True)
+
+    def replot(self, scenario, transect, title_text, output_name=None, output_dir="."):
+        """
+        Re-render the DIN and BOD plots of a saved transect, with no netCDF reads.
+
+        Args:
+            scenario: Scenario name it was saved under
+            transect: Transect name it was saved under
+            title_text: Text to use in plot titles
+            output_name: Name used in the plot filenames, the transect name if None
+            output_dir: Folder to save the plots in
+
+        Returns:
+            list: Paths of the saved plots
+        """
+        from get_graphs import render_transect_plots
+
+        transect_df, point_ids = self.load(scenario, transect)
+        if point_ids is None:
+            point_ids = range(1, len(transect_df) + 1)
+        df = pd.DataFrame({'id': list(point_ids)})
+        return render_transect_plots(transect_df, df, title_text,
+                                     output_name if output_name is not None else transect, output_dir)
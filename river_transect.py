@@ -1,18 +1,156 @@
+import copy
+import hashlib
+import numpy as np
 import pandas as pd
+import shapely
 import matplotlib.pyplot as plt
 from helpers import (
+    BOD_BASELINE,
+    BOD_MEAN_VARIABLE,
+    BOD_STDEV_VARIABLE,
+    DIN_BASELINE,
+    DIN_MEAN_VARIABLES,
+    DIN_STDEV_VARIABLES,
+    WFD_DIN_THRESHOLDS,
+    area_weighted_means,
     calculate_path_distances, 
-    find_element_from_coordinates, 
-    get_value_for_element
+    densify_polyline,
+    get_values_for_elements,
+    lognormal_percentiles
 )
+from mesh_index import get_mesh_index
+from dataset_pool import open_dataset
+from stat_reader import (
+    DEFAULT_MEMORY_BUDGET,
+    element_id_array,
+    read_time_series,
+    stream_time_series_statistics
+)
+from instrumentation import timed
+from transect_files import read_transects
+from element_cache import (
+    DEFAULT_CACHE_DIR,
+    load_cached_element_ids,
+    save_cached_element_ids
+)
+
+# Derived columns: name to (columns it is calculated from, function of those columns).
+# Functions take one float array per dependency and may return a constant.
+DERIVED_VARIABLES = {
+    'mean_din': (DIN_MEAN_VARIABLES, lambda tr2, tr4: tr2 + tr4),
+    # Standard deviations are summed given cTR2 and cTR4 are strongly correlated
+    'din_std_dev': (DIN_STDEV_VARIABLES, lambda tr2, tr4: tr2 + tr4),
+    'BOD Mean': ([BOD_MEAN_VARIABLE], lambda tr3: tr3),
+    'BOD Standard Deviation': ([BOD_STDEV_VARIABLE], lambda tr3: tr3),
+    'DIN 10 Percent Plus Baseline': ([], lambda: DIN_BASELINE),
+    'BOD 10 Percent Plus Baseline': ([], lambda: BOD_BASELINE),
+}
+DERIVED_VARIABLES.update({name: ([], lambda threshold=threshold: threshold)
+                          for name, threshold in WFD_DIN_THRESHOLDS.items()})
+
+# Columns describing the points rather than a variable, always first and in this order
+POINT_COLUMNS = ['easting', 'northing', 'element_id', 'distance']
+
+# Columns describing the face crossed at each point, after POINT_COLUMNS in per-face transects
+CROSSING_COLUMNS = ['start_distance', 'end_distance']
+
+# Mean and standard deviation columns behind each log-normal percentile prefix
+PERCENTILE_SOURCES = {
+    'din_percentile': ('mean_din', 'din_std_dev'),
+    'bod_percentile': ('BOD Mean', 'BOD Standard Deviation'),
+}
+
+
+def derived_variable(name):
+    """
+    Look up how a derived column is calculated.
+    Percentile columns are matched by name, e.g. 'din_percentile_90'.
+    
+    Args:
+        name: Column name
+        
+    Returns:
+        tuple: (dependencies, function), or None for a raw statistics file variable
+    """
+    if name in DERIVED_VARIABLES:
+        return DERIVED_VARIABLES[name]
+    
+    prefix, _, percentile = name.rpartition('_')
+    if prefix in PERCENTILE_SOURCES:
+        try:
+            percentile = float(percentile)
+        except ValueError:
+            return None
+        return (list(PERCENTILE_SOURCES[prefix]),
+                lambda mean, std_dev: lognormal_percentiles(mean, std_dev, [percentile])[percentile])
+    return None
+
+
+def raw_variables(names):
+    """
+    Find the statistics file variables that columns are calculated from.
+    
+    Args:
+        names: Column names, raw variables or derived (e.g. 'din_percentile_90')
+        
+    Returns:
+        list: Raw variable names, in the order evaluate reads them
+    """
+    raw = []
+    
+    def visit(name):
+        definition = derived_variable(name)
+        if definition is None:
+            if name not in raw:
+                raw.append(name)
+            return
+        for dependency in definition[0]:
+            visit(dependency)
+    
+    for name in names:
+        visit(name)
+    return raw
+
+
+def statistics_columns(percentiles=(10, 90)):
+    """
+    Every column the transect plots use, in the order calculate_statistics adds them.
+    
+    Args:
+        percentiles: The percentiles of DIN and BOD
+        
+    Returns:
+        list: Column names
+    """
+    names = ['mean_din', 'din_std_dev']
+    names += [f'din_percentile_{p}' for p in percentiles]
+    names += ['DIN 10 Percent Plus Baseline'] + list(WFD_DIN_THRESHOLDS)
+    names += ['BOD Mean', 'BOD Standard Deviation']
+    names += [f'bod_percentile_{p}' for p in percentiles]
+    names += ['BOD 10 Percent Plus Baseline']
+    return names
+
+
+def _fingerprint(arrays):
+    """Digest of the values in float arrays, to tell whether they have changed"""
+    digest = hashlib.blake2b(digest_size=16)
+    for values in arrays:
+        digest.update(np.ascontiguousarray(values, dtype=np.float64))
+    return digest.digest()
+
 
 class RiverTransect:
     """
     Class to manage data along a river transect.
-    Stores points and their associated data in a pandas DataFrame.
+    Points and their data are held as typed NumPy columns: float64 coordinates,
+    distances and values (NaN where missing), and int32 element IDs with -1
+    where no element was found. The pandas DataFrame (df) is only built from
+    them when asked for, and from then on it holds the data instead, so edits
+    made to it are what later calculations read.
     """
     def __init__(self, eastings, northings, geom_file_path, 
-                 stat_file_path):
+                 stat_file_path, cache_dir=DEFAULT_CACHE_DIR,
+                 distances=None, element_ids=None):
         """
         Initialize the transect with a series of points.
         
@@ -21,6 +159,11 @@ class RiverTransect:
             northings: List of Y coordinates
             geom_file_path: Path to the geometry netCDF file
             stat_file_path: Path to the statistics netCDF file
+            cache_dir: Folder for the on-disk element ID and mesh caches, or None to disable them
+            distances: Distance of each point along the transect, calculated
+                from the points if None
+            element_ids: Element ID of each point (-1 or None where there is none),
+                looked up from the points if None
         """
         # Validate inputs
         if len(eastings) != len(northings):
@@ -29,65 +172,289 @@ class RiverTransect:
         # Store file paths
         self.geom_file_path = geom_file_path
         self.stat_file_path = stat_file_path
+        self.cache_dir = cache_dir
+        
+        # Column name to array of one value per point, starting with the coordinates,
+        # until df is built (then None). Arrays are replaced rather than modified,
+        # so copies can share them.
+        self.columns = {
+            'easting': np.asarray(eastings, dtype=np.float64),
+            'northing': np.asarray(northings, dtype=np.float64)
+        }
+        self._df = None
+        
+        # Derived column name to a fingerprint of the columns it was calculated from
+        self._derived_inputs = {}
+        
+        # Calculate distances and element IDs, unless already known
+        if distances is None:
+            self.get_distances()
+        else:
+            self._set_columns({'distance': np.asarray(distances, dtype=np.float64)})
         
-        # Create initial DataFrame with coordinates
-        self.df = pd.DataFrame({
-            'easting': eastings,
-            'northing': northings
-        })
-        
-        # Calculate distances and element IDs
-        self.get_distances()
-        self.get_element_ids()
+        if element_ids is None:
+            self.get_element_ids()
+        else:
+            self._set_columns({'element_id': element_ids})
         
         # Reorder columns to put element_id as the third column
-        if 'element_id' in self.df.columns and 'distance' in self.df.columns:
-            self.df = self.df[['easting', 'northing', 'element_id', 'distance']]
+        self.columns = {name: self.columns[name] for name in POINT_COLUMNS}
     
+    @classmethod
+    def from_polyline(cls, eastings, northings, geom_file_path, stat_file_path,
+                      spacing=None, per_face=False, cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Create a transect sampled along a polyline rather than only at its vertices.
+        
+        Args:
+            eastings: X coordinates of the polyline vertices, in order
+            northings: Y coordinates of the polyline vertices, in order
+            geom_file_path: Path to the geometry netCDF file
+            stat_file_path: Path to the statistics netCDF file
+            spacing: Distance between samples along the polyline (e.g. 1 for every metre)
+            per_face: If True, sample once per mesh face crossed by the polyline instead,
+                at the midpoint of the crossing. Adds 'start_distance' and 'end_distance'
+                columns giving where the polyline enters and leaves each face.
+            cache_dir: Folder for the on-disk element ID and mesh caches, or None to disable them
+            
+        Returns:
+            RiverTransect: The transect, with 'distance' the exact chainage along the polyline
+        """
+        if per_face:
+            crossings = get_mesh_index(geom_file_path, cache_dir).trace_polyline(eastings, northings)
+            return cls._from_crossings(crossings, geom_file_path, stat_file_path, cache_dir)
+        
+        if spacing is None:
+            raise ValueError("Either spacing or per_face must be given")
+        
+        sample_eastings, sample_northings, chainages = densify_polyline(eastings, northings, spacing)
+        return cls(sample_eastings, sample_northings, geom_file_path, stat_file_path,
+                   cache_dir=cache_dir, distances=chainages)
+    
+    @classmethod
+    def _from_crossings(cls, crossings, geom_file_path, stat_file_path, cache_dir):
+        """Create a per-face transect from MeshIndex.trace_polyline output"""
+        transect = cls(crossings['easting'], crossings['northing'], geom_file_path, stat_file_path,
+                       cache_dir=cache_dir, distances=crossings['chainage'],
+                       element_ids=crossings['element_id'])
+        transect._set_columns({'start_distance': crossings['start_chainage'],
+                               'end_distance': crossings['end_chainage']})
+        return transect
+    
+    @classmethod
+    def from_file(cls, path, geom_file_path, stat_file_path, layer=None, bbox=None,
+                  spacing=None, per_face=False, id_column='id', cache_dir=DEFAULT_CACHE_DIR):
+        """
+        Create transects straight from a shapefile or GeoPackage layer, without
+        converting it to CSV first. A point layer gives one transect; a line layer
+        gives one per feature. Element IDs for every transect in the layer are
+        looked up (or, per face, traced) together in one batch.
+        
+        Args:
+            path: Shapefile or GeoPackage path
+            geom_file_path: Path to the geometry netCDF file
+            stat_file_path: Path to the statistics netCDF file
+            layer: Layer name or index, the first layer if None
+            bbox: (xmin, ymin, xmax, ymax) to read only features intersecting it,
+                using the .qix spatial index of a shapefile
+            spacing: Distance between samples along each transect, only the
+                points or vertices themselves if None (see from_polyline)
+            per_face: If True, sample once per mesh face crossed (see from_polyline)
+            id_column: Attribute holding point IDs in a point layer
+            cache_dir: Folder for the on-disk element ID and mesh caches, or None to disable them
+            
+        Returns:
+            dict: Transect name to RiverTransect, in file order
+        """
+        features = read_transects(path, layer, bbox, id_column)
+        
+        if per_face:
+            # Every feature is traced through the mesh together
+            traces = get_mesh_index(geom_file_path, cache_dir).trace_polylines(
+                [(feature['easting'], feature['northing']) for feature in features])
+            return {feature['name']: cls._from_crossings(crossings, geom_file_path, stat_file_path, cache_dir)
+                    for feature, crossings in zip(features, traces)}
+        
+        samples = []
+        for feature in features:
+            if spacing is None:
+                samples.append((feature['easting'], feature['northing'], None))
+            else:
+                samples.append(densify_polyline(feature['easting'], feature['northing'], spacing))
+        if not samples:
+            return {}
+        
+        # Look up every sample in the layer at once, then split per transect
+        all_eastings = np.concatenate([sample[0] for sample in samples])
+        all_northings = np.concatenate([sample[1] for sample in samples])
+        combined = cls(all_eastings, all_northings, geom_file_path, stat_file_path,
+                       cache_dir=cache_dir, distances=np.zeros(len(all_eastings)))
+        element_ids = combined._column('element_id')
+        
+        transects = {}
+        start = 0
+        for feature, (eastings, northings, chainages) in zip(features, samples):
+            stop = start + len(eastings)
+            transects[feature['name']] = cls(eastings, northings, geom_file_path, stat_file_path,
+                                             cache_dir=cache_dir, distances=chainages,
+                                             element_ids=element_ids[start:stop])
+            start = stop
+        return transects
+    
+    def with_stat_file(self, stat_file_path):
+        """
+        Create a copy of this transect that reads from another statistics file.
+        Coordinates, distances, element IDs and (for per-face transects) the
+        crossing distances are reused, so no spatial lookup is repeated.
+        
+        Args:
+            stat_file_path: Path to the statistics netCDF file
+            
+        Returns:
+            RiverTransect: The new transect, holding no loaded variables
+        """
+        transect = copy.copy(self)
+        transect.stat_file_path = stat_file_path
+        transect.columns = {name: self._column(name)
+                            for name in POINT_COLUMNS + CROSSING_COLUMNS if self._has_column(name)}
+        transect._df = None
+        transect._derived_inputs = {}
+        return transect
+    
+    @property
+    def df(self):
+        """
+        All transect data as a pandas DataFrame, built from the columns on first
+        use. From then on the DataFrame holds the data in place of the columns,
+        so edits made to it are kept and used by later calculations.
+        """
+        if self._df is None:
+            # Each column is copied into the DataFrame as it is dropped, so the
+            # data is not held twice over
+            columns, self.columns = self.columns, None
+            data = {}
+            for name in list(columns):
+                data[name] = np.array(self._frame_values(name, columns.pop(name)))
+            self._df = pd.DataFrame(data, copy=False)
+        return self._df
+    
+    @df.setter
+    def df(self, frame):
+        self.columns = None
+        self._df = frame
+    
+    def _column(self, name):
+        """A column as an array, with int32 element IDs (-1 where missing)"""
+        if self.columns is not None:
+            return self.columns[name]
+        series = self._df[name]
+        if name == 'element_id':
+            return element_id_array(series.fillna(-1).to_numpy(dtype=np.int64), dtype=np.int32)
+        return series.to_numpy()
+    
+    def _has_column(self, name):
+        """Whether the transect data has a column"""
+        return name in (self.columns if self.columns is not None else self._df.columns)
+    
+    def _set_columns(self, columns):
+        """
+        Add or replace columns.
+        
+        Args:
+            columns: Dict of column name to one value per point, or to a single
+                value shared by every point (stored once, as a broadcast view)
+        """
+        n_points = len(self.columns['easting'] if self.columns is not None else self._df)
+        for name, values in columns.items():
+            if name == 'element_id':
+                values = element_id_array(values, dtype=np.int32)
+            elif np.ndim(values) == 0:
+                values = np.broadcast_to(np.asarray(values, dtype=np.float64), (n_points,))
+            else:
+                values = np.asarray(values)
+            if len(values) != n_points:
+                raise ValueError(f"Column {name} has {len(values)} values for {n_points} points")
+            if self.columns is not None:
+                self.columns[name] = values
+            else:
+                self._df[name] = self._frame_values(name, values)
+            self._derived_inputs.pop(name, None)
+    
+    @staticmethod
+    def _frame_values(name, values):
+        """A column's values as they appear in the DataFrame"""
+        if name != 'element_id':
+            return values
+        # Integers when every point has an element, otherwise objects with None for the missing ones
+        if (values >= 0).all():
+            return values.astype(np.int64)
+        frame_values = values.astype(object)
+        frame_values[values < 0] = None
+        return frame_values
+    
+    @property
+    def element_ids(self):
+        """int32 element ID of each point, -1 where no element was found"""
+        return self._column('element_id')
+    
+    @property
+    def mesh_index(self):
+        """Shared MeshIndex for the geometry file, loaded on first use (from the mesh cache if possible)"""
+        return get_mesh_index(self.geom_file_path, self.cache_dir)
+    
+    @timed('locate')
     def get_element_ids(self):
         """
-        Populate the dataframe with element IDs for each point.
+        Populate the 'element_id' column with the element containing each point.
+        Results are cached on disk per geometry file, so repeat runs over the
+        same points skip the spatial lookup (and loading the mesh) entirely.
         
         Returns:
             list: The element IDs for all points (None for points where no element was found)
         """
-        element_ids = []
-        total_points = len(self.df)
-        points_not_found = 0
+        eastings = self._column('easting')
+        northings = self._column('northing')
+        total_points = len(eastings)
         
         print(f"Finding element IDs for {total_points} points...")
         
-        for i, row in self.df.iterrows():
-            element_id = find_element_from_coordinates(row['easting'], row['northing'], self.geom_file_path)
-            
-            if element_id is None:
-                points_not_found += 1
-                print(f"Warning: Could not find element for point {i+1} of {total_points} at coordinates " 
-                      f"({row['easting']:.1f}, {row['northing']:.1f})")
-            
-            element_ids.append(element_id)
+        located = None
+        if self.cache_dir is not None:
+            located = load_cached_element_ids(self.geom_file_path, eastings, northings, self.cache_dir)
+            if located is not None:
+                print("Using cached element IDs.")
+        
+        if located is None:
+            # Walk from each point's element to the next, falling back to the global index
+            located = self.mesh_index.locate_points_walk(eastings, northings)
+            if self.cache_dir is not None:
+                save_cached_element_ids(self.geom_file_path, eastings, northings, located, self.cache_dir)
         
-        # Add to DataFrame
-        self.df['element_id'] = element_ids
+        located = np.asarray(located)
+        not_found = np.nonzero(located < 0)[0]
+        points_not_found = len(not_found)
+        for i in not_found:
+            print(f"Warning: Could not find element for point {i+1} of {total_points} at coordinates " 
+                  f"({eastings[i]:.1f}, {northings[i]:.1f})")
+        
+        self._set_columns({'element_id': located})
         
         # Print summary
         if points_not_found > 0:
             print(f"Warning: Could not find elements for {points_not_found} out of {total_points} points.")
-            print("Consider increasing search_radius in helpers.py if points are within model domain.")
+            print("Check that these points lie within the model domain.")
         else:
             print("Successfully found elements for all points.")
             
-        return element_ids
+        return [None if element_id < 0 else int(element_id) for element_id in located]
     
     def get_distances(self):
         """
-        Populate the dataframe with cumulative distances along the transect.
+        Populate the 'distance' column with cumulative distances along the transect.
         """
-        if len(self.df) > 0:
-            distances = calculate_path_distances(self.df['easting'].tolist(), self.df['northing'].tolist())
-            self.df['distance'] = distances
-            return distances
-        return []
+        distances = calculate_path_distances(self._column('easting'), self._column('northing'))
+        self._set_columns({'distance': np.asarray(distances, dtype=np.float64)})
+        return distances
         
     def load_variable(self, variable_name):
         """
@@ -99,19 +466,126 @@ class RiverTransect:
         Returns:
             True if successful, False otherwise
         """
-        values = []
-        for element_id in self.df['element_id']:
-            if element_id is not None:
-                value = get_value_for_element(element_id, variable_name, self.stat_file_path)
-                values.append(value)
-            else:
-                values.append(None)
+        return self.load_variables([variable_name])
+    
+    @timed('load_variables')
+    def load_variables(self, variable_names):
+        """
+        Load values for several variables at each point in the transect.
+        The statistics file is read once for all variables and the columns
+        are added together.
+        
+        Args:
+            variable_names: Names of the variables to load
         
-        # Add to DataFrame
-        self.df[variable_name] = values
+        Returns:
+            True if every variable was loaded with at least one valid value, False otherwise
+        """
+        values = get_values_for_elements(self._column('element_id'), variable_names, self.stat_file_path)
+        self._set_columns(values)
         
         # Check if we got any valid values
-        return any(v is not None for v in values)
+        return all(name in values and not np.isnan(values[name]).all() for name in variable_names)
+    
+    def add_variables(self, values):
+        """
+        Add variables already read for this transect's points, e.g. by
+        read_variables_concurrently for several statistics files at once.
+        
+        Args:
+            values: Dict of variable name to one value per point
+        """
+        self._set_columns(values)
+    
+    @timed('time_series')
+    def load_time_series(self, map_file_path, variable_names, memory_budget=DEFAULT_MEMORY_BUDGET, times=None):
+        """
+        Extract full time series of variables at each point from a map file.
+        
+        Args:
+            map_file_path: Path to the map netCDF file
+            variable_names: Names of the (time, face) variables to read, e.g. concentrations of cTR2
+            memory_budget: Approximate maximum bytes read in one block
+            times: Slice of the time dimension to read, all times if None
+            
+        Returns:
+            dict: Variable name to float array of shape (time, point), NaN where there is no value
+        """
+        return read_time_series(map_file_path, variable_names, self._column('element_id'), memory_budget, times)
+    
+    @timed('empirical_percentiles')
+    def calculate_empirical_percentiles(self, map_file_path, variable_names, percentiles=(10, 90),
+                                        name='din', threshold=None,
+                                        memory_budget=DEFAULT_MEMORY_BUDGET, times=None):
+        """
+        Calculate empirical percentiles from time series in a map file, instead of
+        assuming a log-normal distribution. Time series are streamed through P²
+        quantile sketches, so memory does not grow with the length of the run.
+        The columns sit alongside the log-normal ones for comparison, e.g.
+        'din_empirical_percentile_90' next to 'din_percentile_90'.
+        
+        Args:
+            map_file_path: Path to the map netCDF file
+            variable_names: (time, face) variables summed at each time step,
+                e.g. the cTR2 and cTR4 concentrations for DIN
+            percentiles: The percentiles to calculate (e.g., [10, 50, 90])
+            name: Column name prefix, e.g. 'din' or 'bod'
+            threshold: Concentration to test exceedance against, or None to skip.
+                Adds '<name>_exceedance_steps', '<name>_exceedance_fraction' and
+                '<name>_longest_exceedance' columns.
+            memory_budget: Approximate maximum bytes read in one block
+            times: Slice of the time dimension to read, all times if None
+            
+        Returns:
+            pandas.DataFrame: The added columns
+        """
+        statistics = stream_time_series_statistics(map_file_path, variable_names, self._column('element_id'),
+                                                   percentiles, threshold, memory_budget, times)
+        
+        # Add with descriptive column names
+        columns = {}
+        for key, values in statistics.items():
+            if key.startswith('percentile_'):
+                columns[f'{name}_empirical_{key}'] = values
+            else:
+                columns[f'{name}_{key}'] = values
+        self._set_columns(columns)
+        
+        return self.get_dataframe(list(columns))
+    
+    def reach_average(self, variable_names=None, buffer=None, polygon=None, depth_variable=None):
+        """
+        Calculate reach-averaged values over the mesh faces around the transect,
+        rather than point samples. Faces are weighted by the area of them inside
+        the reach (and optionally by water depth).
+        
+        Args:
+            variable_names: Face variables to average, the DIN and BOD means if None
+            buffer: Distance (m) either side of the transect line defining the reach
+            polygon: shapely Polygon to use as the reach instead of a buffer
+            depth_variable: Face variable holding water depth to weight by, or None
+            
+        Returns:
+            dict: Variable name to weighted mean, plus 'faces', 'area' and, when
+            the DIN means are included, 'mean_din' (their sum, as for the points)
+        """
+        if polygon is None:
+            if buffer is None:
+                raise ValueError("Either buffer or polygon must be given")
+            coords = np.column_stack((self._column('easting'), self._column('northing')))
+            line = shapely.LineString(coords) if len(coords) > 1 else shapely.Point(coords[0])
+            polygon = line.buffer(buffer)
+        
+        if variable_names is None:
+            variable_names = DIN_MEAN_VARIABLES + [BOD_MEAN_VARIABLE]
+        
+        results = area_weighted_means(polygon, variable_names, self.geom_file_path,
+                                      self.stat_file_path, depth_variable)
+        
+        # Weighted means are linear, so mean DIN is the sum of the cTR2 and cTR4 means
+        if all(var in results for var in DIN_MEAN_VARIABLES):
+            results['mean_din'] = sum(results[var] for var in DIN_MEAN_VARIABLES)
+        return results
     
     def plot_transect(self, variable_name=None):
         """
@@ -131,23 +605,26 @@ class RiverTransect:
         if variable_name is None:
             return fig, ax
             
-        # Check if the variable exists in the dataframe
-        if variable_name in self.df.columns:
+        # Check if the variable exists in the transect data
+        if self._has_column(variable_name):
+            distances = self._column('distance')
+            values = self._column(variable_name)
+            
             # Plot distance vs variable value
-            ax.plot(self.df['distance'], self.df[variable_name], 'o-')
+            ax.plot(distances, values, 'o-')
             ax.set_xlabel('Distance along transect (m)')
             ax.set_ylabel(variable_name)
             ax.set_title(f'Transect profile - {variable_name}')
             
             # Add point labels
-            for i, (d, v) in enumerate(zip(self.df['distance'], self.df[variable_name])):
+            for i, (d, v) in enumerate(zip(distances, values)):
                 if v is not None:  # Only label points with valid values
                     ax.text(d, v, f'  {i+1}', va='center')
                     
             plt.grid(True)
             plt.tight_layout()
         else:
-            # Variable doesn't exist in the dataframe
+            # Variable doesn't exist in the transect data
             print(f"Warning: Variable '{variable_name}' not found in transect data")
             
         return fig, ax
@@ -159,10 +636,8 @@ class RiverTransect:
         Returns:
             list: Names of all variables in the statistics file
         """
-        import netCDF4
-        
         try:
-            with netCDF4.Dataset(self.stat_file_path) as nc:
+            with open_dataset(self.stat_file_path) as nc:
                 # Get all variable names
                 variables = list(nc.variables.keys())
                 
@@ -176,9 +651,96 @@ class RiverTransect:
             print(f"Error reading variables: {e}")
             return []
     
-    def get_dataframe(self):
-        """Return the pandas DataFrame containing all transect data"""
-        return self.df
+    def get_dataframe(self, columns=None):
+        """
+        Build a pandas DataFrame from the transect's columns.
+        
+        Args:
+            columns: Names of the columns to include, all of them (as df) if None
+            
+        Returns:
+            pandas.DataFrame: One row per point
+        """
+        if columns is None:
+            return self.df
+        columns = list(columns)
+        if self.columns is None:
+            return self._df[columns]
+        
+        # Float columns are copied straight into one 2-D block, rather than pandas
+        # copying them one at a time and then again to consolidate them
+        floats = [name for name in columns
+                  if name != 'element_id' and self.columns[name].dtype == np.float64]
+        block = np.empty((len(floats), len(self.columns['easting'])))
+        for i, name in enumerate(floats):
+            block[i] = self.columns[name]
+        frame = pd.DataFrame(block.T, columns=floats, copy=False)
+        
+        # Then the others (element IDs, counts) in their places
+        for position, name in enumerate(columns):
+            if name not in floats:
+                frame.insert(position, name, self._frame_values(name, self.columns[name]))
+        return frame
+    
+    @timed('evaluate')
+    def evaluate(self, names):
+        """
+        Make sure the named columns are in the transect data.
+        Dependencies are resolved through DERIVED_VARIABLES, every raw variable
+        still missing is read from the statistics file in one bulk read, and
+        each derived column is calculated once, in dependency order. Columns
+        already present are reused, unless they are derived columns whose
+        inputs have changed (e.g. edited in df) since they were calculated.
+        
+        Args:
+            names: Column names, raw variables or derived (e.g. 'din_percentile_90')
+            
+        Returns:
+            bool: True if every named column is now available, False otherwise
+        """
+        raw, derived, seen = [], [], set()
+        
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            present = self._has_column(name)
+            definition = derived_variable(name)
+            if definition is None:
+                if not present:
+                    raw.append(name)
+                return
+            # Columns given rather than calculated here are kept as they are
+            if present and name not in self._derived_inputs:
+                return
+            dependencies = definition[0]
+            for dependency in dependencies:
+                visit(dependency)
+            if (not present or any(dep in raw or dep in derived for dep in dependencies)
+                    or _fingerprint(self._column(dep) for dep in dependencies) != self._derived_inputs[name]):
+                derived.append(name)
+        
+        for name in names:
+            visit(name)
+        
+        if raw:
+            self.load_variables(raw)
+        
+        columns, inputs = {}, {}
+        for name in derived:
+            dependencies, function = derived_variable(name)
+            if not all(dep in columns or self._has_column(dep) for dep in dependencies):
+                continue
+            arrays = [columns[dep] if dep in columns else np.asarray(self._column(dep), dtype=np.float64)
+                      for dep in dependencies]
+            columns[name] = function(*arrays)
+            inputs[name] = _fingerprint(arrays)
+        
+        # Add together
+        self._set_columns(columns)
+        self._derived_inputs.update(inputs)
+        
+        return all(self._has_column(name) for name in names)
     
     def get_din(self):
         """
@@ -187,30 +749,19 @@ class RiverTransect:
         Returns:
             bool: True if calculation successful, False otherwise
         """
-        # Load required variables if they aren't already loaded
-        variables = ['Mesh2D_2d_MEAN_FullRun_cTR2', 'Mesh2D_2d_MEAN_FullRun_cTR4']
-        for var in variables:
-            if var not in self.df.columns:
-                self.load_variable(var)
-        
-        # Check if all required variables were successfully loaded
-        if not all(var in self.df.columns for var in variables):
+        if not self.evaluate(['mean_din']):
             print("Warning: Could not calculate mean DIN - required variables not available")
             return False
-        
-        # Calculate mean DIN and add to dataframe
-        self.df['mean_din'] = self.df['Mesh2D_2d_MEAN_FullRun_cTR2'] + self.df['Mesh2D_2d_MEAN_FullRun_cTR4']
-        
         return True
     
     def wfd_performance(self):
+        """
+        Add the constant WFD DIN thresholds ('WFD High' ... 'WFD Poor') to the transect data.
         
-        self.df['WFD High'] = 0.282
-        self.df['WFD Good'] = 3.807
-        self.df['WFD Moderate'] = 5.7105
-        self.df['WFD Poor'] = 8.56575
-        
-        return True
+        Returns:
+            bool: Always returns True
+        """
+        return self.evaluate(list(WFD_DIN_THRESHOLDS))
 
     def get_din_std_dev(self):
         """
@@ -220,38 +771,9 @@ class RiverTransect:
         Returns:
             bool: True if calculation successful, False otherwise
         """
-        # Load required variables if they aren't already loaded
-        variables = ['Mesh2D_2d_STDEV_FullRun_cTR2', 'Mesh2D_2d_STDEV_FullRun_cTR4']
-        for var in variables:
-            if var not in self.df.columns:
-                self.load_variable(var)
-        
-        # Check if all required variables were successfully loaded
-        if not all(var in self.df.columns for var in variables):
+        if not self.evaluate(['din_std_dev']):
             print("Warning: Could not calculate DIN standard deviation - required variables not available")
             return False
-        
-        # Get shorthands for easier formula expression
-        stdev_tr2 = self.df['Mesh2D_2d_STDEV_FullRun_cTR2']
-        stdev_tr4 = self.df['Mesh2D_2d_STDEV_FullRun_cTR4']
-        
-        import numpy as np
-        
-        # Handle the calculation with proper masked array support
-        # First convert pandas series to numpy arrays
-        tr2_array = np.array(stdev_tr2)
-        tr4_array = np.array(stdev_tr4)
-        
-        # Replace None with np.nan
-        tr2_array = np.where(pd.isna(tr2_array), np.nan, tr2_array)
-        tr4_array = np.where(pd.isna(tr4_array), np.nan, tr4_array)
-        
-        # Calculate the result
-        result = tr2_array+tr4_array
-        
-        # Add to DataFrame
-        self.df['din_std_dev'] = result
-        
         return True
     
     def calculate_din_percentile(self, percentile):
@@ -264,58 +786,28 @@ class RiverTransect:
         Returns:
             pandas.Series: The calculated percentile values for each point
         """
-        import numpy as np
-        from scipy import stats
+        result = self.calculate_din_percentiles([percentile])
+        if result is None:
+            return None
+        return result[f'din_percentile_{percentile}']
+    
+    def calculate_din_percentiles(self, percentiles):
+        """
+        Calculate several percentiles of DIN using log-normal distribution.
         
-        # Ensure we have mean_din and din_std_dev
-        if 'mean_din' not in self.df.columns:
-            success = self.get_din()
-            if not success:
-                return None
-        
-        if 'din_std_dev' not in self.df.columns:
-            success = self.get_din_std_dev()
-            if not success:
-                return None
-        
-        # Get the mean and standard deviation
-        mean_din = self.df['mean_din']
-        std_dev_din = self.df['din_std_dev']
-        
-        # Convert percentile to proportion (e.g., 90 -> 0.9)
-        p = percentile / 100.0
-        
-        # Calculate parameters of the log-normal distribution
-        # For a log-normal distribution with mean m and variance s²:
-        # The underlying normal distribution has parameters:
-        # μ = ln(m²/√(m² + s²))
-        # σ = √(ln(1 + s²/m²))
-        
-        # Create empty series for results
-        result = pd.Series(index=self.df.index)
-        
-        for i in self.df.index:
-            m = mean_din[i]
-            s = std_dev_din[i]
-            
-            # Handle null values or zeros
-            if pd.isna(m) or pd.isna(s) or m <= 0:
-                result[i] = None
-                continue
-            
-            # Calculate parameters of underlying normal distribution
-            mu = np.log(m**2 / np.sqrt(m**2 + s**2))
-            sigma = np.sqrt(np.log(1 + (s**2 / m**2)))
+        Args:
+            percentiles: The percentiles to calculate (e.g., [10, 50, 90])
             
-            # Calculate the percentile using the log-normal distribution
-            percentile_value = np.exp(mu + sigma * stats.norm.ppf(p))
-            result[i] = percentile_value
-        
-        # Add to DataFrame with a descriptive column name
-        column_name = f'din_percentile_{percentile}'
-        self.df[column_name] = result
+        Returns:
+            pandas.DataFrame: One column per percentile, named 'din_percentile_<p>'
+        """
+        # Ensure we have mean_din and din_std_dev
+        if not (self.get_din() and self.get_din_std_dev()):
+            return None
         
-        return result
+        columns = [f'din_percentile_{p}' for p in percentiles]
+        self.evaluate(columns)
+        return self.get_dataframe(columns)
     
     def get_bod(self):
         """
@@ -326,26 +818,12 @@ class RiverTransect:
         Returns:
             bool: True if calculation successful, False otherwise
         """
-        # Load mean BOD values
-        if 'BOD Mean' not in self.df.columns:
-            success = self.load_variable('Mesh2D_2d_MEAN_FullRun_cTR3')
-            if success:
-                # Rename the column
-                self.df['BOD Mean'] = self.df['Mesh2D_2d_MEAN_FullRun_cTR3']
-                self.df.drop('Mesh2D_2d_MEAN_FullRun_cTR3', axis=1, inplace=True)
-            else:
-                print("Warning: Could not load BOD Mean data")
-                return False
+        names = ['BOD Mean', 'BOD Standard Deviation']
+        self.evaluate(names)
         
-        # Load BOD standard deviation values
-        if 'BOD Standard Deviation' not in self.df.columns:
-            success = self.load_variable('Mesh2D_2d_STDEV_FullRun_cTR3')
-            if success:
-                # Rename the column
-                self.df['BOD Standard Deviation'] = self.df['Mesh2D_2d_STDEV_FullRun_cTR3']
-                self.df.drop('Mesh2D_2d_STDEV_FullRun_cTR3', axis=1, inplace=True)
-            else:
-                print("Warning: Could not load BOD Standard Deviation data")
+        for name in names:
+            if not self._has_column(name) or np.isnan(self._column(name)).all():
+                print(f"Warning: Could not load {name} data")
                 return False
         
         return True
@@ -360,64 +838,59 @@ class RiverTransect:
         Returns:
             pandas.Series: The calculated percentile values for each point
         """
-        import numpy as np
-        from scipy import stats
+        result = self.calculate_bod_percentiles([percentile])
+        if result is None:
+            return None
+        return result[f'bod_percentile_{percentile}']
+    
+    def calculate_bod_percentiles(self, percentiles):
+        """
+        Calculate several percentiles of BOD using log-normal distribution.
         
+        Args:
+            percentiles: The percentiles to calculate (e.g., [10, 50, 90])
+            
+        Returns:
+            pandas.DataFrame: One column per percentile, named 'bod_percentile_<p>'
+        """
         # Ensure we have BOD Mean and BOD Standard Deviation
         if not self.get_bod():
             return None
         
-        # Get the mean and standard deviation
-        mean_bod = self.df['BOD Mean']
-        std_dev_bod = self.df['BOD Standard Deviation']
-        
-        # Convert percentile to proportion (e.g., 90 -> 0.9)
-        p = percentile / 100.0
-        
-        # Calculate parameters of the log-normal distribution
-        # Create empty series for results
-        result = pd.Series(index=self.df.index)
-        
-        for i in self.df.index:
-            m = mean_bod[i]
-            s = std_dev_bod[i]
-            
-            # Handle null values or zeros
-            if pd.isna(m) or pd.isna(s) or m <= 0:
-                result[i] = None
-                continue
-            
-            # Calculate parameters of underlying normal distribution
-            mu = np.log(m**2 / np.sqrt(m**2 + s**2))
-            sigma = np.sqrt(np.log(1 + (s**2 / m**2)))
-            
-            # Calculate the percentile using the log-normal distribution
-            percentile_value = np.exp(mu + sigma * stats.norm.ppf(p))
-            result[i] = percentile_value
-        
-        # Add to DataFrame with a descriptive column name
-        column_name = f'bod_percentile_{percentile}'
-        self.df[column_name] = result
-        
-        return result
+        columns = [f'bod_percentile_{p}' for p in percentiles]
+        self.evaluate(columns)
+        return self.get_dataframe(columns)
     
     def add_bod_baseline(self):
         """
-        Add constant BOD baseline value (4.4) to the dataframe.
+        Add constant BOD baseline value (4.4) to the transect data.
         
         Returns:
             bool: Always returns True
         """
-        self.df['BOD 10 Percent Plus Baseline'] = 4.4
-        return True
+        return self.evaluate(['BOD 10 Percent Plus Baseline'])
 
     def add_din_baseline(self):
         """
-        Add constant DIN baseline value (0.88) to the dataframe.
+        Add constant DIN baseline value (0.88) to the transect data.
         
         Returns:
             bool: Always returns True
         """
-        self.df['DIN 10 Percent Plus Baseline'] = 0.88
-        return True
+        return self.evaluate(['DIN 10 Percent Plus Baseline'])
 
+    def calculate_statistics(self, percentiles=(10, 90)):
+        """
+        Calculate all DIN and BOD statistics used in the transect plots:
+        means, standard deviations, log-normal percentiles, baselines and WFD thresholds.
+        
+        Args:
+            percentiles: The percentiles of DIN and BOD to calculate
+            
+        Returns:
+            pandas.DataFrame: The transect data
+        """
+        # All raw variables behind the columns are read from the statistics file in one go
+        self.evaluate(statistics_columns(percentiles))
+        
+        return self.df
@@ -0,0 +1,151 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from concurrent_reads import read_variables_concurrently
+from river_transect import CROSSING_COLUMNS, POINT_COLUMNS, raw_variables, statistics_columns
+
+# Loads reading less than this many bytes of values in total run in this process,
+# where starting worker processes would take longer than the reads themselves
+SERIAL_LOAD_BYTES = 64 * 2**20
+
+
+def _scenario_statistics(transect, percentiles):
+    """Calculate the transect statistics for one scenario (runs in a worker process)"""
+    return transect.calculate_statistics(percentiles)
+
+
+class ScenarioBatch:
+    """
+    Compare many WAQ scenarios run on the same mesh along one transect.
+    Element IDs are resolved once by the base transect, and the statistics
+    of every scenario are then read from its own stat_map file.
+    """
+    def __init__(self, transect, stat_files):
+        """
+        Initialize the batch.
+
+        Args:
+            transect: RiverTransect with element IDs already resolved
+            stat_files: Dict of scenario name to statistics netCDF file path
+        """
+        self.transect = transect
+        self.stat_files = dict(stat_files)
+        self.results = {}
+
+    def load(self, percentiles=(10, 90), max_workers=None):
+        """
+        Calculate the DIN and BOD statistics for every scenario.
+        Small loads, and any with max_workers 1, run in this process: the
+        element IDs are mapped once and each statistics file is read in turn.
+        Larger loads run one scenario per worker process.
+
+        Args:
+            percentiles: The percentiles of DIN and BOD to calculate
+            max_workers: Number of worker processes, os.cpu_count() if None. 1 runs in this process.
+
+        Returns:
+            pandas.DataFrame: Long-format table, see to_long_dataframe
+        """
+        transects = {name: self.transect.with_stat_file(path) for name, path in self.stat_files.items()}
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        max_workers = max(1, min(max_workers, len(transects)))
+
+        variable_names = raw_variables(statistics_columns(percentiles))
+        element_ids = self.transect.element_ids
+        load_bytes = len(element_ids) * len(variable_names) * len(transects) * 8
+
+        if max_workers == 1 or load_bytes <= SERIAL_LOAD_BYTES:
+            values = read_variables_concurrently(
+                element_ids, {path: variable_names for path in self.stat_files.values()})
+            self.results = {}
+            for name, transect in transects.items():
+                transect.add_variables(values[transect.stat_file_path])
+                self.results[name] = _scenario_statistics(transect, percentiles)
+        else:
+            # Spawned workers do not inherit this process's open netCDF handles
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=context) as executor:
+                futures = {name: executor.submit(_scenario_statistics, transect, percentiles)
+                           for name, transect in transects.items()}
+                self.results = {name: future.result() for name, future in futures.items()}
+
+        return self.to_long_dataframe()
+
+    def to_long_dataframe(self):
+        """
+        Combine the scenario results into one tidy table.
+
+        Returns:
+            pandas.DataFrame: One row per scenario, point and metric, with columns
+            scenario, point, easting, northing, element_id, distance (and for per-face
+            transects start_distance and end_distance), metric and value
+        """
+        frames = []
+        for name, df in self.results.items():
+            df = df.reset_index(names='point')
+            id_vars = ['point'] + POINT_COLUMNS + [column for column in CROSSING_COLUMNS if column in df.columns]
+            long_df = df.melt(id_vars=id_vars, var_name='metric', value_name='value')
+            long_df.insert(0, 'scenario', name)
+            frames.append(long_df)
+
+        if not frames:
+            return pd.DataFrame(columns=['scenario', 'point'] + POINT_COLUMNS + ['metric', 'value'])
+        return pd.concat(frames, ignore_index=True)
+
+    def plot_scenarios(self, metric, ax=None):
+        """
+        Plot one metric along the transect with a line per scenario.
+
+        Args:
+            metric: Column to plot, e.g. 'mean_din' or 'bod_percentile_90'
+            ax: Matplotlib axis to plot on, a new figure is created if None
+
+        Returns:
+            matplotlib axis: The axis plotted on
+        """
+        if ax is None:
+            fig = Figure(figsize=(12, 7))
+            FigureCanvasAgg(fig)
+            ax = fig.add_subplot()
+
+        for name, df in self.results.items():
+            if metric in df.columns:
+                ax.plot(df['distance'], df[metric], 'o-', label=name)
+            else:
+                print(f"Warning: Metric '{metric}' not available for scenario {name}")
+
+        ax.set_xlabel('Distance (m)')
+        ax.set_ylabel(metric)
+        ax.set_title(f'{metric} by scenario')
+        ax.legend()
+        ax.grid(True)
+        return ax
+
+    def save_scenario_plots(self, metrics, output_dir=".", filename_prefix="scenarios"):
+        """
+        Save a scenario overlay plot for each metric.
+
+        Args:
+            metrics: Columns to plot
+            output_dir: Folder to save the plots in
+            filename_prefix: Start of each plot filename
+
+        Returns:
+            list: Paths of the saved plots
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        filenames = []
+        for metric in metrics:
+            ax = self.plot_scenarios(metric)
+            ax.figure.tight_layout()
+
+            plot_filename = os.path.join(output_dir, f"{filename_prefix}_{metric.replace(' ', '_')}.png")
+            ax.figure.savefig(plot_filename, dpi=300)
+            print(f"Plot saved to {plot_filename}")
+            filenames.append(plot_filename)
+        return filenames
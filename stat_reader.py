@@ -0,0 +1,312 @@
+import warnings
+import numpy as np
+from dataset_pool import open_dataset
+from instrumentation import count
+from quantile_sketch import StreamingTimeSeriesStatistics
+
+# Default memory budget for one chunk of data across all variables (bytes)
+DEFAULT_MEMORY_BUDGET = 64 * 2**20
+
+
+def _storage_chunks(variable):
+    """
+    Get the on-disk chunk length along the time and face dimensions.
+
+    Returns:
+        tuple: (time_chunk, face_chunk), 1 where the variable is contiguous
+    """
+    chunking = variable.chunking()
+    if chunking == 'contiguous' or chunking is None:
+        return 1, 1
+    if variable.ndim == 1:
+        return 1, chunking[0]
+    return chunking[0], chunking[-1]
+
+
+def _align(size, chunk):
+    """Round size down to a whole number of chunks, if it covers at least one"""
+    return (size // chunk) * chunk if size >= chunk else size
+
+
+def element_id_array(element_ids, dtype=np.int64):
+    """
+    Convert element IDs to an integer array with -1 where there is no element.
+    Integer arrays and Series (such as RiverTransect's int32 element IDs) are
+    converted without a Python loop; lists may hold None for missing elements.
+
+    Args:
+        element_ids: Element IDs, with -1 or None where there is none
+        dtype: Integer dtype of the result
+
+    Returns:
+        numpy.ndarray: The element IDs
+    """
+    if getattr(element_ids, 'dtype', None) is not None and element_ids.dtype.kind in 'iu':
+        result = np.asarray(element_ids).astype(dtype)
+    else:
+        result = np.array([-1 if e is None or e != e else e for e in element_ids], dtype=dtype)
+    result[result < 0] = -1
+    return result
+
+
+def read_element_block(variable, times, element_ids, max_gap_ratio=4):
+    """
+    Read a (time, element) block of a variable for sorted, unique element IDs.
+    When the IDs are close together a contiguous slice covering them is read
+    and subset in memory, which is much cheaper than a scattered read.
+
+    Args:
+        variable: netCDF4 variable with dimensions (time, face) or (face)
+        times: Slice of the time dimension to read (ignored for 1-D variables)
+        element_ids: Sorted array of unique element IDs
+        max_gap_ratio: Read a contiguous slice when it is at most this many
+            times longer than the number of element IDs
+
+    Returns:
+        numpy.ndarray: Float array of shape (time, element) with NaN for masked values
+    """
+    element_ids = np.asarray(element_ids, dtype=np.int64)
+    lo, hi = element_ids[0], element_ids[-1] + 1
+    contiguous = hi - lo <= max_gap_ratio * len(element_ids)
+    if contiguous:
+        data = variable[times, lo:hi] if variable.ndim > 1 else variable[lo:hi]
+    else:
+        data = variable[times, element_ids] if variable.ndim > 1 else variable[element_ids]
+    count('netcdf_reads')
+    count('netcdf_bytes_read', np.ma.getdata(data).nbytes)
+    if contiguous:
+        data = data[..., element_ids - lo]
+
+    data = np.ma.filled(np.ma.asarray(data, dtype=np.float64), np.nan)
+    return data.reshape((-1, len(element_ids)))
+
+
+def iter_stat_chunks(stat_file_path, variable_names, memory_budget=DEFAULT_MEMORY_BUDGET,
+                     times=None, element_ids=None):
+    """
+    Stream aligned chunks of several variables from a statistics or map file.
+    Chunk shapes are chosen so that one chunk of every variable together fits
+    within memory_budget, and are rounded to whole netCDF storage chunks.
+    All variables must share the same (time, face) or (face) dimensions.
+
+    Args:
+        stat_file_path: Path to the statistics (or map) netCDF file
+        variable_names: Names of the variables to read
+        memory_budget: Approximate maximum bytes held by one chunk
+        times: Slice of the time dimension to read, all times if None
+        element_ids: Element IDs to read, every face if None. They are
+            sorted and deduplicated.
+
+    Yields:
+        tuple: (faces, times, data) where faces is a slice of the face dimension
+        (or an array of element IDs when element_ids is given), times is a slice
+        of the time dimension and data maps each variable name to a float array
+        of shape (time, face) with NaN for masked values
+    """
+    with open_dataset(stat_file_path) as nc:
+        missing = [var for var in variable_names if var not in nc.variables]
+        if missing:
+            raise KeyError(f"Variables {missing} not found in {stat_file_path}")
+
+        variables = [nc.variables[var] for var in variable_names]
+        shape = variables[0].shape
+        if any(var.shape != shape for var in variables):
+            raise ValueError("All variables must have the same dimensions")
+
+        n_times = shape[0] if len(shape) > 1 else 1
+        n_faces = shape[-1]
+        times = slice(0, n_times) if times is None else slice(*times.indices(n_times))
+        n_sel_times = len(range(times.start, times.stop, times.step or 1))
+
+        # Largest storage chunk across the variables, so reads stay chunk-aligned
+        storage = [_storage_chunks(var) for var in variables]
+        time_chunk = max(chunk[0] for chunk in storage)
+        face_chunk = max(chunk[1] for chunk in storage)
+
+        # Number of (time, face) cells of every variable that fit in the budget
+        budget_cells = max(1, memory_budget // (8 * len(variables)))
+
+        # Prefer the whole time window, as long as a storage chunk of faces still fits
+        time_window = min(n_sel_times, max(1, budget_cells // face_chunk))
+        time_window = max(1, _align(time_window, time_chunk))
+        face_window = max(1, _align(budget_cells // time_window, face_chunk))
+
+        if element_ids is None:
+            face_blocks = (slice(start, min(start + face_window, n_faces))
+                           for start in range(0, n_faces, face_window))
+        else:
+            unique_ids = np.unique(np.asarray(element_ids, dtype=np.int64))
+            unique_ids = unique_ids[unique_ids >= 0]
+            face_blocks = (unique_ids[start:start + face_window]
+                           for start in range(0, len(unique_ids), face_window))
+
+        step = times.step or 1
+        for faces in face_blocks:
+            for start in range(times.start, times.stop, time_window * step):
+                window = slice(start, min(start + time_window * step, times.stop), step)
+                if element_ids is None:
+                    data = {}
+                    for name, var in zip(variable_names, variables):
+                        raw = var[window, faces] if var.ndim > 1 else var[faces]
+                        count('netcdf_reads')
+                        count('netcdf_bytes_read', np.ma.getdata(raw).nbytes)
+                        data[name] = np.ma.filled(np.ma.asarray(raw, dtype=np.float64),
+                                                  np.nan).reshape((-1, faces.stop - faces.start))
+                else:
+                    data = {name: read_element_block(var, window, faces)
+                            for name, var in zip(variable_names, variables)}
+                yield faces, window, data
+
+
+def read_time_series(map_file_path, variable_names, element_ids, memory_budget=DEFAULT_MEMORY_BUDGET,
+                     times=None):
+    """
+    Extract full time series of several variables at a set of elements.
+    Only the requested elements are read, in time-chunked blocks bounded by
+    memory_budget, so the rest of the map file is never loaded.
+
+    Args:
+        map_file_path: Path to the map (or statistics) netCDF file
+        variable_names: Names of the (time, face) variables to read
+        element_ids: Element ID of each point, -1 (or None) where there is none
+        memory_budget: Approximate maximum bytes read in one block
+        times: Slice of the time dimension to read, all times if None
+
+    Returns:
+        dict: Variable name to float array of shape (time, point), with NaN
+        for points without an element and for masked values
+    """
+    element_ids = element_id_array(element_ids)
+    valid = element_ids >= 0
+    unique_ids, inverse = np.unique(element_ids[valid], return_inverse=True)
+
+    with open_dataset(map_file_path) as nc:
+        missing = [var for var in variable_names if var not in nc.variables]
+        if missing:
+            raise KeyError(f"Variables {missing} not found in {map_file_path}")
+        variable = nc.variables[variable_names[0]]
+        n_times = variable.shape[0] if variable.ndim > 1 else 1
+
+    time_range = range(n_times)[times] if times is not None else range(n_times)
+    series = {name: np.full((len(time_range), len(unique_ids)), np.nan) for name in variable_names}
+
+    if len(unique_ids) > 0:
+        # Position of each chunk's elements among the unique IDs
+        chunks = iter_stat_chunks(map_file_path, variable_names, memory_budget,
+                                  times=times, element_ids=unique_ids)
+        for faces, window, data in chunks:
+            columns = np.searchsorted(unique_ids, faces)
+            first_row = (window.start - time_range.start) // time_range.step
+            rows = slice(first_row, first_row + len(range(window.start, window.stop, window.step)))
+            for name, values in data.items():
+                series[name][rows, columns] = values
+
+    results = {}
+    for name, values in series.items():
+        result = np.full((len(time_range), len(element_ids)), np.nan)
+        result[:, valid] = values[:, inverse]
+        results[name] = result
+    return results
+
+
+def time_series_statistics(series, percentiles=(10, 50, 90), threshold=None):
+    """
+    Calculate empirical percentiles and threshold exceedance from time series.
+
+    Args:
+        series: Float array of shape (time, point), NaN for missing values
+        percentiles: Percentiles to calculate
+        threshold: Concentration to test exceedance against, or None to skip
+
+    Returns:
+        dict: 'percentile_<p>' arrays per point, and if threshold is given
+        'exceedance_steps' (time steps above the threshold), 'exceedance_fraction'
+        (share of valid time steps above it) and 'longest_exceedance' (longest
+        run of consecutive time steps above it)
+    """
+    series = np.asarray(series, dtype=np.float64)
+    valid_steps = np.sum(~np.isnan(series), axis=0)
+
+    results = {}
+    with warnings.catch_warnings():
+        # Points without any valid value give NaN, which is what we want
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for p in percentiles:
+            if series.shape[0] > 0:
+                results[f'percentile_{p}'] = np.nanpercentile(series, p, axis=0)
+            else:
+                results[f'percentile_{p}'] = np.full(series.shape[1], np.nan)
+
+    if threshold is not None:
+        above = series > threshold
+        steps = above.sum(axis=0)
+        results['exceedance_steps'] = steps
+        with np.errstate(invalid='ignore', divide='ignore'):
+            results['exceedance_fraction'] = np.where(valid_steps > 0, steps / valid_steps, np.nan)
+
+        # Longest run: length of the current run at every step, then the maximum
+        run = np.zeros(series.shape[1], dtype=np.int64)
+        longest = np.zeros(series.shape[1], dtype=np.int64)
+        for row in above:
+            run = np.where(row, run + 1, 0)
+            np.maximum(longest, run, out=longest)
+        results['longest_exceedance'] = longest
+
+    return results
+
+
+def stream_time_series_statistics(map_file_path, variable_names, element_ids, percentiles=(10, 50, 90),
+                                  threshold=None, memory_budget=DEFAULT_MEMORY_BUDGET, times=None):
+    """
+    Calculate empirical percentiles and threshold exceedance at a set of elements.
+    When the time series of the elements fit in memory_budget they are read in
+    full and the statistics are exact (see time_series_statistics). Otherwise
+    blocks are read as in read_time_series and fed to P² quantile sketches, so
+    memory stays O(points) however long the map file is, and percentiles are
+    exact for the first values of each series and estimates after that.
+
+    Args:
+        map_file_path: Path to the map (or statistics) netCDF file
+        variable_names: Names of the (time, face) variables to read. Their values
+            are summed at each time step, e.g. cTR2 and cTR4 for DIN.
+        element_ids: Element ID of each point, -1 (or None) where there is none
+        percentiles: Percentiles to estimate
+        threshold: Concentration to test exceedance against, or None to skip
+        memory_budget: Approximate maximum bytes read in one block
+        times: Slice of the time dimension to read, all times if None
+
+    Returns:
+        dict: Same keys as time_series_statistics, with one value per point
+        and NaN (or 0 for counts) for points without an element
+    """
+    element_ids = element_id_array(element_ids)
+    valid = element_ids >= 0
+    unique_ids, inverse = np.unique(element_ids[valid], return_inverse=True)
+
+    with open_dataset(map_file_path) as nc:
+        variable = nc.variables[variable_names[0]]
+        n_times = variable.shape[0] if variable.ndim > 1 else 1
+    n_steps = len(range(n_times)[times]) if times is not None else n_times
+
+    # Exact when every variable's series and their sum fit in the budget together
+    if n_steps * len(unique_ids) * (len(variable_names) + 1) * 8 <= memory_budget:
+        series = read_time_series(map_file_path, variable_names, unique_ids, memory_budget, times)
+        statistics = time_series_statistics(sum(series[name] for name in variable_names),
+                                            percentiles, threshold)
+    else:
+        streaming = StreamingTimeSeriesStatistics(len(unique_ids), percentiles, threshold)
+        # Face blocks come outermost, so each element sees its time steps in order
+        chunks = iter_stat_chunks(map_file_path, variable_names, memory_budget,
+                                  times=times, element_ids=unique_ids)
+        for faces, window, data in chunks:
+            total = sum(data[name] for name in variable_names)
+            streaming.update(total, columns=np.searchsorted(unique_ids, faces))
+        statistics = streaming.result()
+
+    results = {}
+    for key, values in statistics.items():
+        fill = np.nan if values.dtype.kind == 'f' else 0
+        result = np.full(len(element_ids), fill, dtype=values.dtype)
+        result[valid] = values[inverse]
+        results[key] = result
+    return results
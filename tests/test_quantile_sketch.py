@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+from quantile_sketch import P2Quantile, StreamingTimeSeriesStatistics
+from stat_reader import time_series_statistics
+
+
+def lognormal_series(n_times, n_series, seed=0):
+    """Skewed, concentration-like series of shape (time, series)"""
+    return np.random.default_rng(seed).lognormal(1.0, 0.6, size=(n_times, n_series))
+
+
+@pytest.mark.parametrize('n_times', [1, 5, 6, 14, 50])
+@pytest.mark.parametrize('percentile', [10, 50, 90])
+def test_exact_for_short_series(n_times, percentile):
+    series = lognormal_series(n_times, 200)
+    sketch = P2Quantile(percentile, 200)
+    for row in series:
+        sketch.update(row)
+    np.testing.assert_allclose(sketch.result(), np.percentile(series, percentile, axis=0))
+
+
+@pytest.mark.parametrize('percentile', [10, 50, 90])
+def test_accurate_after_switching_to_estimates(percentile):
+    series = lognormal_series(2000, 200)
+    sketch = P2Quantile(percentile, 200)
+    for row in series:
+        sketch.update(row)
+    exact = np.percentile(series, percentile, axis=0)
+    assert np.median(np.abs(sketch.result() / exact - 1)) < 0.02
+
+
+def test_nan_values_skipped():
+    series = lognormal_series(14, 50)
+    series[::3, ::2] = np.nan
+    sketch = P2Quantile(90, 50)
+    for row in series:
+        sketch.update(row)
+    np.testing.assert_allclose(sketch.result(), np.nanpercentile(series, 90, axis=0))
+
+
+def test_streaming_statistics_match_exact_at_14_steps():
+    series = lognormal_series(14, 100)
+    streaming = StreamingTimeSeriesStatistics(100, (10, 50, 90), threshold=3.0)
+    streaming.update(series[:8])
+    streaming.update(series[8:])
+    expected = time_series_statistics(series, (10, 50, 90), threshold=3.0)
+    result = streaming.result()
+    assert result.keys() == expected.keys()
+    for key in expected:
+        np.testing.assert_allclose(result[key], expected[key])
+
+
+def test_exact_count_must_hold_five_markers():
+    with pytest.raises(ValueError):
+        P2Quantile(90, 10, exact_count=4)
@@ -0,0 +1,151 @@
+import os
+import warnings
+import numpy as np
+import pandas as pd
+import shapely
+
+# Vector formats read directly, without converting to CSV first
+TRANSECT_FILE_EXTENSIONS = ('.shp', '.gpkg')
+
+# Attribute fields tried, in order, for the name of a line feature
+NAME_FIELDS = ('name', 'Name', 'NAME')
+
+
+def _require_pyogrio():
+    """
+    Import pyogrio, which is only needed for reading shapefiles and GeoPackages.
+
+    Returns:
+        module: pyogrio, with pyogrio.raw loaded
+    """
+    try:
+        import pyogrio
+        import pyogrio.raw
+    except ImportError as e:
+        raise ImportError("Reading shapefiles and GeoPackages requires pyogrio (pip install pyogrio)") from e
+    return pyogrio
+
+
+def is_transect_file(path):
+    """True if the path is a shapefile or GeoPackage rather than a CSV file"""
+    return os.path.splitext(path)[1].lower() in TRANSECT_FILE_EXTENSIONS
+
+
+def read_layer(path, layer=None, bbox=None, feature=None):
+    """
+    Read the geometries and attributes of a vector layer straight into arrays.
+    A bbox is applied by OGR as a spatial filter, which uses the shapefile's
+    .qix spatial index (or the GeoPackage R-tree) to skip features outside it.
+
+    Args:
+        path: Shapefile or GeoPackage path
+        layer: Layer name or index, the first layer if None
+        bbox: (xmin, ymin, xmax, ymax) to read only features intersecting it
+        feature: Index of a single feature to read, all features if None
+
+    Returns:
+        tuple: (geometries, attributes) with geometries a numpy array of shapely
+        geometries and attributes a DataFrame with one row per feature
+    """
+    pyogrio = _require_pyogrio()
+    kwargs = {}
+    if feature is not None:
+        kwargs = {'skip_features': feature, 'max_features': 1}
+
+    with warnings.catch_warnings():
+        # Only x and y are used, so dropping measures (e.g. PointZM from ArcGIS) is harmless
+        warnings.filterwarnings('ignore', message='Measured', category=UserWarning)
+        meta, _, geometry, field_data = pyogrio.raw.read(path, layer=layer, bbox=bbox, **kwargs)
+    geometries = shapely.from_wkb(geometry)
+    attributes = pd.DataFrame(dict(zip(meta['fields'], field_data)))
+    return geometries, attributes
+
+
+def read_transects(path, layer=None, bbox=None, id_column='id', feature=None):
+    """
+    Read the transects in a shapefile or GeoPackage layer.
+    A point layer is one transect, with points in order of id_column (as the
+    Usk transect shapefiles are laid out). In a line layer every feature is a
+    transect along its vertices. Coordinates are extracted for every feature
+    at once with shapely.get_coordinates.
+
+    Args:
+        path: Shapefile or GeoPackage path
+        layer: Layer name or index, the first layer if None
+        bbox: (xmin, ymin, xmax, ymax) to read only features intersecting it
+        id_column: Attribute holding point IDs in a point layer, file order if missing
+        feature: Index of a single feature to read, all features if None
+
+    Returns:
+        list: One dict per transect with 'name', 'easting', 'northing' and 'id'
+        (point IDs, or vertex numbers from 1 for lines)
+    """
+    geometries, attributes = read_layer(path, layer, bbox, feature)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(geometries) == 0:
+        return []
+
+    coords, index = shapely.get_coordinates(geometries, return_index=True)
+    types = shapely.get_type_id(geometries)
+    is_point = np.isin(types, [shapely.GeometryType.POINT, shapely.GeometryType.MULTIPOINT])
+
+    if is_point.all():
+        # One transect of points, ordered by their IDs when there are any
+        if id_column in attributes.columns:
+            point_ids = attributes[id_column].to_numpy()[index]
+            order = np.argsort(point_ids, kind='stable')
+        else:
+            point_ids = np.arange(1, len(coords) + 1)
+            order = np.arange(len(coords))
+        return [{
+            'name': stem,
+            'easting': coords[order, 0],
+            'northing': coords[order, 1],
+            'id': point_ids[order]
+        }]
+
+    if is_point.any():
+        raise ValueError(f"{path} mixes point and line features")
+
+    name_field = next((field for field in NAME_FIELDS if field in attributes.columns), None)
+    bounds = np.searchsorted(index, np.arange(len(geometries) + 1))
+
+    transects = []
+    names = set()
+    for i in range(len(geometries)):
+        start, stop = bounds[i], bounds[i + 1]
+        if stop - start == 0:
+            continue
+        if name_field is not None and not pd.isna(attributes[name_field].iloc[i]):
+            name = str(attributes[name_field].iloc[i])
+        else:
+            name = f"{stem}_{(feature or 0) + i + 1}"
+        if name in names:
+            name = f"{name}_{(feature or 0) + i + 1}"
+        names.add(name)
+        transects.append({
+            'name': name,
+            'easting': coords[start:stop, 0],
+            'northing': coords[start:stop, 1],
+            'id': np.arange(1, stop - start + 1)
+        })
+    return transects
+
+
+def count_transects(path, layer=None):
+    """
+    Count the transects in a layer without reading its geometry coordinates.
+
+    Args:
+        path: Shapefile or GeoPackage path
+        layer: Layer name or index, the first layer if None
+
+    Returns:
+        int: 1 for a point layer, otherwise the number of line features
+    """
+    with warnings.catch_warnings():
+        warnings.filterwarnings('ignore', message='Measured', category=UserWarning)
+        info = _require_pyogrio().read_info(path, layer=layer)
+    if 'point' in str(info['geometry_type']).lower():
+        return 1
+    return int(info['features'])